@@ -0,0 +1,279 @@
+import os
+import sys
+import csv
+import time
+import argparse
+from datetime import time as Time
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, select, insert, and_
+from sql.database import engine, SQLModel, insert_returning_ids
+from sql.migrations import run_migrations
+from sql.models import Station, TrainRunNum, Route, StationPair, MAX_ROUTE_STOPS
+
+# 批量导入时刻表：车站名到编号的映射只查询一次，线路按批插入，整个导入在一个事务中完成，有任何错误则全部回滚
+#
+# CSV 格式
+#   stations.csv: name,city
+#   routes.csv:   train_run_num,sequence,station,arrival_time,departure_time,kilometers
+# GTFS 格式（目录）
+#   stops.txt:      stop_id,stop_name[,city]       没有 city 列时以车站名作为城市
+#   trips.txt:      trip_id[,trip_short_name]      可选，车次标识取 trip_short_name，否则取 trip_id
+#   stop_times.txt: trip_id,arrival_time,departure_time,stop_id,stop_sequence,shape_dist_traveled
+# 同一车次标识的站点行必须相邻，文件按行流式读取，内存中只保留当前一批线路
+
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", 500))
+# 错误过多时提前停止
+IMPORT_MAX_ERRORS = 100
+
+
+class TimetableImportError(Exception):
+    pass
+
+
+def parse_time(value: str):
+    parts = value.strip().split(":")
+    if len(parts) not in (2, 3) or not all(part.isdigit() for part in parts):
+        raise ValueError(f"invalid time {value!r}")
+    hour, minute, second = (int(part) for part in parts + ["0"] * (3 - len(parts)))
+    if hour >= 24:
+        raise ValueError(f"times past midnight are not supported: {value!r}")
+    return Time(hour, minute, second)
+
+
+class TimetableImporter:
+    def __init__(self, session: Session, batch_size: int = IMPORT_BATCH_SIZE):
+        self.session = session
+        self.batch_size = batch_size
+        self.station_ids: dict[str, int] = dict(session.exec(select(Station.name, Station.id)).all())
+        self.existing_names = set(session.exec(select(TrainRunNum.name)).all())
+        self.seen_names: set[str] = set()
+        # 待插入的线路：(车次标识, [(车站编号, 序号, 到站, 发车, 里程)])
+        self.pending: list[tuple[str, list[tuple]]] = []
+        self.errors: list[str] = []
+        self.stations = 0
+        self.train_run_nums = 0
+        self.routes = 0
+        self.skipped = 0
+
+    def error(self, message: str):
+        self.errors.append(message)
+        if len(self.errors) >= IMPORT_MAX_ERRORS:
+            raise TimetableImportError(f"stopped after {IMPORT_MAX_ERRORS} errors")
+
+    def add_stations(self, stations):
+        # stations: (位置, 车站名, 城市)；已存在的车站直接复用
+        rows, names = [], set()
+        for where, name, city in stations:
+            if name not in self.station_ids and name not in names:
+                names.add(name)
+                rows.append({"name": name, "city": city or name})
+                if len(rows) >= self.batch_size:
+                    self.insert_stations(rows)
+                    rows = []
+        self.insert_stations(rows)
+
+    def insert_stations(self, rows: list[dict]):
+        for station_id, row in zip(insert_returning_ids(self.session, Station, rows), rows):
+            self.station_ids.setdefault(row["name"], station_id)
+        self.stations += len(rows)
+
+    def add_train_run_num(self, where: str, name: str, routes: list[tuple]):
+        # routes: (位置, 序号, 车站名, 到站, 发车, 里程)，序号须从 1 开始连续，里程不减，与接口的校验一致
+        if name in self.seen_names:
+            self.error(f"{where}: rows of train run number {name!r} are not contiguous")
+            return
+        self.seen_names.add(name)
+        if name in self.existing_names:
+            self.skipped += 1
+            return
+        if len(routes) < 2:
+            self.error(f"{where}: train run number {name!r} has fewer than two stops")
+            return
+        if len(routes) > MAX_ROUTE_STOPS:
+            self.error(f"{where}: train run number {name!r} has {len(routes)} stops, at most {MAX_ROUTE_STOPS} are supported")
+            return
+        stops = []
+        kilometers = 0
+        for i, (route_where, sequence, station_name, arrival_time, departure_time, route_kilometers) in enumerate(routes, 1):
+            if sequence != i:
+                self.error(f"{route_where}: invalid sequence {sequence} for {name!r}, expected {i}")
+                return
+            if route_kilometers < kilometers:
+                self.error(f"{route_where}: kilometers decrease for {name!r}")
+                return
+            station_id = self.station_ids.get(station_name)
+            if station_id is None:
+                self.error(f"{route_where}: station {station_name!r} not found")
+                return
+            kilometers = route_kilometers
+            stops.append((station_id, sequence, arrival_time, departure_time, route_kilometers))
+        self.pending.append((name, stops))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending or self.errors:
+            self.pending = []
+            return
+        train_run_num_ids = insert_returning_ids(self.session, TrainRunNum, [{"name": name} for name, _ in self.pending])
+        routes = [
+            {
+                "train_run_num_id": train_run_num_id, "station_id": station_id, "sequence": sequence,
+                "arrival_time": arrival_time, "departure_time": departure_time, "kilometers": kilometers,
+            }
+            for train_run_num_id, (_, stops) in zip(train_run_num_ids, self.pending)
+            for station_id, sequence, arrival_time, departure_time, kilometers in stops
+        ]
+        # 绕过 ORM 的批量插入，由驱动直接 executemany
+        self.session.connection().execute(Route.__table__.insert(), routes)
+        # 起讫站组合的行数与站点数的平方成正比，用一条 INSERT ... SELECT 在数据库内由站点自连接生成
+        start_route, end_route = aliased(Route), aliased(Route)
+        self.session.execute(
+            insert(StationPair).from_select(
+                ["start_station_id", "end_station_id", "train_run_num_id", "start_sequence", "end_sequence"],
+                select(start_route.station_id, end_route.station_id, start_route.train_run_num_id, start_route.sequence, end_route.sequence)
+                .join(end_route, and_(end_route.train_run_num_id == start_route.train_run_num_id, end_route.sequence > start_route.sequence))
+                .where(start_route.train_run_num_id.in_(train_run_num_ids))
+            )
+        )
+        self.train_run_nums += len(train_run_num_ids)
+        self.routes += len(routes)
+        self.pending = []
+
+    def add_timetable(self, rows):
+        # rows: (位置, 车次标识, 序号, 车站名, 到站, 发车, 里程)，同一车次标识的行相邻
+        name, first_where, routes = None, None, []
+        for where, row_name, *route in rows:
+            if row_name != name:
+                if name is not None:
+                    self.add_train_run_num(first_where, name, routes)
+                name, first_where, routes = row_name, where, []
+            routes.append((where, *route))
+        if name is not None:
+            self.add_train_run_num(first_where, name, routes)
+        self.flush()
+
+
+def read_csv(path: str):
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        for line, row in enumerate(csv.DictReader(file), 2):
+            yield f"{os.path.basename(path)}:{line}", row
+
+def require(row: dict, *columns: str):
+    missing = [column for column in columns if not (row.get(column) or "").strip()]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    return [row[column].strip() for column in columns]
+
+def parse_rows(importer: TimetableImporter, rows, parse):
+    # 单行格式错误记录后跳过，不中断读取
+    for where, row in rows:
+        try:
+            yield where, *parse(row)
+        except ValueError as exception:
+            importer.error(f"{where}: {exception}")
+
+def csv_stations(row: dict):
+    name, = require(row, "name")
+    return name, (row.get("city") or "").strip()
+
+def csv_route(row: dict):
+    name, sequence, station, arrival_time, departure_time, kilometers = require(
+        row, "train_run_num", "sequence", "station", "arrival_time", "departure_time", "kilometers")
+    return name, int(sequence), station, parse_time(arrival_time), parse_time(departure_time), int(float(kilometers))
+
+def import_csv(importer: TimetableImporter, stations_path: str | None, routes_path: str):
+    if stations_path is not None:
+        importer.add_stations(parse_rows(importer, read_csv(stations_path), csv_stations))
+    importer.add_timetable(parse_rows(importer, read_csv(routes_path), csv_route))
+
+def import_gtfs(importer: TimetableImporter, directory: str):
+    stop_names = {}
+
+    def gtfs_stop(row: dict):
+        stop_id, name = require(row, "stop_id", "stop_name")
+        stop_names[stop_id] = name
+        return name, (row.get("city") or "").strip()
+
+    importer.add_stations(parse_rows(importer, read_csv(os.path.join(directory, "stops.txt")), gtfs_stop))
+
+    trip_names = {}
+    trips_path = os.path.join(directory, "trips.txt")
+    if os.path.exists(trips_path):
+        for _, row in read_csv(trips_path):
+            if row.get("trip_id") and (row.get("trip_short_name") or "").strip():
+                trip_names[row["trip_id"].strip()] = row["trip_short_name"].strip()
+
+    # GTFS 的 stop_sequence 只要求递增，按出现顺序重新编号为 1, 2, 3...
+    last = {"trip_id": None, "stop_sequence": 0, "sequence": 0}
+
+    def gtfs_stop_time(row: dict):
+        trip_id, arrival_time, departure_time, stop_id, stop_sequence, kilometers = require(
+            row, "trip_id", "arrival_time", "departure_time", "stop_id", "stop_sequence", "shape_dist_traveled")
+        stop_sequence = int(stop_sequence)
+        if trip_id != last["trip_id"]:
+            last.update(trip_id=trip_id, stop_sequence=stop_sequence, sequence=1)
+        elif stop_sequence <= last["stop_sequence"]:
+            raise ValueError(f"stop_sequence {stop_sequence} is not increasing")
+        else:
+            last.update(stop_sequence=stop_sequence, sequence=last["sequence"] + 1)
+        if stop_id not in stop_names:
+            raise ValueError(f"unknown stop_id {stop_id!r}")
+        return (trip_names.get(trip_id, trip_id), last["sequence"], stop_names[stop_id],
+                parse_time(arrival_time), parse_time(departure_time), int(float(kilometers)))
+
+    importer.add_timetable(parse_rows(importer, read_csv(os.path.join(directory, "stop_times.txt")), gtfs_stop_time))
+
+
+def run_import(load, dry_run: bool = False, batch_size: int = IMPORT_BATCH_SIZE, bind=engine):
+    SQLModel.metadata.create_all(bind)
+    run_migrations(bind)
+    with Session(bind) as session:
+        importer = TimetableImporter(session, batch_size)
+        try:
+            load(importer)
+        except TimetableImportError as exception:
+            importer.errors.append(str(exception))
+        if importer.errors or dry_run:
+            session.rollback()
+        else:
+            session.commit()
+    return importer
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import stations, train run numbers and routes")
+    parser.add_argument("--dry-run", action="store_true", help="validate and roll back")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="train run numbers per insert batch")
+    formats = parser.add_subparsers(dest="format", required=True)
+    csv_parser = formats.add_parser("csv", help="stations.csv and routes.csv")
+    csv_parser.add_argument("--stations", help="CSV with name,city")
+    csv_parser.add_argument("--routes", required=True, help="CSV with train_run_num,sequence,station,arrival_time,departure_time,kilometers")
+    gtfs_parser = formats.add_parser("gtfs", help="directory with stops.txt, stop_times.txt and optionally trips.txt")
+    gtfs_parser.add_argument("directory")
+    args = parser.parse_args()
+    if args.batch_size < 1:
+        parser.error("--batch-size must be positive")
+
+    if args.format == "csv":
+        load = lambda importer: import_csv(importer, args.stations, args.routes)
+    else:
+        load = lambda importer: import_gtfs(importer, args.directory)
+    started = time.perf_counter()
+    try:
+        importer = run_import(load, args.dry_run, args.batch_size)
+    except OSError as exception:
+        print(exception)
+        sys.exit(1)
+    for error in importer.errors:
+        print(error)
+    if importer.errors:
+        print("import failed, nothing was written")
+        sys.exit(1)
+    print(f"{'validated' if args.dry_run else 'imported'} stations: {importer.stations}, train_run_nums: {importer.train_run_nums}, "
+          f"routes: {importer.routes}, skipped existing train_run_nums: {importer.skipped} in {time.perf_counter() - started:.1f}s")
+    # 运行中的服务缓存了车站与线路，导入后需重启才能看到新数据
+    if not args.dry_run:
+        print("restart running servers to refresh their timetable caches")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import sys
+import time
+import json
+import random
+import asyncio
+import argparse
+import httpx
+from sqlmodel import Session, select
+from sql.database import engine
+from sql.models import User, TrainRun, Route, Station
+from sql.security import create_access_token
+
+# 压测：在进程内（或对 --url 指定的服务）按比例混合发送查询、下单和订单历史请求，统计延迟分位数与吞吐量
+# 先用 python -m sql.seed 生成数据，再运行 python loadtest.py
+
+DEFAULT_MIX = "demand=6,order=2,history=2"
+# 这些状态码是业务上的正常拒绝（如余票不足），不计为错误
+EXPECTED_STATUS = {"order": {400, 409}}
+
+
+class Workload:
+    def __init__(self, session: Session, rng: random.Random):
+        self.rng = rng
+        self.user_ids = session.exec(select(User.id)).all()
+        self.train_runs = session.exec(
+            select(TrainRun.id, TrainRun.train_run_num_id, TrainRun.running_date)
+            .where(TrainRun.locked == True, TrainRun.finished == False)
+        ).all()
+        self.routes: dict[int, list] = {}
+        for train_run_num_id, route_id, sequence, station_name in session.exec(
+            select(Route.train_run_num_id, Route.id, Route.sequence, Station.name)
+            .join(Station, Route.station_id == Station.id)
+            .order_by(Route.train_run_num_id, Route.sequence)
+        ).all():
+            self.routes.setdefault(train_run_num_id, []).append((route_id, sequence, station_name))
+        if not self.user_ids or not self.train_runs:
+            raise ValueError("no users or train runs on sale, run python -m sql.seed first")
+
+    def segment(self):
+        train_run_id, train_run_num_id, running_date = self.rng.choice(self.train_runs)
+        routes = self.routes[train_run_num_id]
+        start, end = sorted(self.rng.sample(range(len(routes)), 2))
+        return train_run_id, train_run_num_id, running_date, routes, routes[start], routes[end]
+
+    def demand(self):
+        _, _, running_date, _, start, end = self.segment()
+        return "POST", "/train_runs/demand", {
+            "running_date": running_date.isoformat(), "start_station": start[2], "end_station": end[2],
+        }
+
+    def order(self):
+        train_run_id, train_run_num_id, _, routes, start, end = self.segment()
+        return "POST", "/orders/create", {
+            "user_id": self.rng.choice(self.user_ids), "total_routes": len(routes),
+            "train_run_id": train_run_id, "train_run_num_id": train_run_num_id,
+            "start_route_id": start[0], "start_seq": start[1], "end_route_id": end[0], "end_seq": end[1],
+        }
+
+    def history(self):
+        return "GET", f"/orders/user/{self.rng.choice(self.user_ids)}", None
+
+
+class Results:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = {}
+        self.statuses: dict[str, dict[int, int]] = {}
+        self.errors: dict[str, int] = {}
+
+    def record(self, name: str, seconds: float, status: int):
+        self.latencies.setdefault(name, []).append(seconds)
+        statuses = self.statuses.setdefault(name, {})
+        statuses[status] = statuses.get(status, 0) + 1
+        if status >= 400 and status not in EXPECTED_STATUS.get(name, ()):
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def summary(self, elapsed: float):
+        rows = {}
+        for name, latencies in [*sorted(self.latencies.items()), ("total", [l for ls in self.latencies.values() for l in ls])]:
+            if not latencies:
+                continue
+            latencies = sorted(latencies)
+            rows[name] = {
+                "requests": len(latencies),
+                "errors": sum(self.errors.values()) if name == "total" else self.errors.get(name, 0),
+                "throughput": len(latencies) / elapsed,
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p95_ms": percentile(latencies, 95) * 1000,
+                "p99_ms": percentile(latencies, 99) * 1000,
+                "max_ms": latencies[-1] * 1000,
+            }
+            if name != "total":
+                rows[name]["statuses"] = dict(sorted(self.statuses[name].items()))
+        return rows
+
+
+def percentile(sorted_values: list[float], p: float):
+    # 最近秩法
+    index = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+def parse_mix(mix: str):
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        if name not in ("demand", "order", "history") or not weight.isdigit():
+            raise argparse.ArgumentTypeError(f"invalid mix item: {item}")
+        weights[name] = int(weight)
+    if not any(weights.values()):
+        raise argparse.ArgumentTypeError("mix weights are all zero")
+    return weights
+
+
+async def worker(client: httpx.AsyncClient, workload: Workload, weights: dict[str, int], results: Results, deadline: float, remaining: list[int]):
+    names, counts = list(weights), list(weights.values())
+    while time.perf_counter() < deadline and remaining[0] > 0:
+        remaining[0] -= 1
+        name = workload.rng.choices(names, counts)[0]
+        method, path, body = getattr(workload, name)()
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=body)
+            status = response.status_code
+        except httpx.HTTPError:
+            status = 599
+        results.record(name, time.perf_counter() - started, status)
+
+async def run(client: httpx.AsyncClient, workload: Workload, weights: dict[str, int], concurrency: int, duration: float, requests: int, warmup: int):
+    # 预热请求不计入结果，用于填充库存、票价和查询缓存
+    await asyncio.gather(*(
+        worker(client, workload, weights, Results(), float("inf"), [warmup // concurrency])
+        for _ in range(concurrency)
+    ))
+    results = Results()
+    started = time.perf_counter()
+    remaining = [requests or sys.maxsize]
+    await asyncio.gather(*(
+        worker(client, workload, weights, results, started + duration, remaining)
+        for _ in range(concurrency)
+    ))
+    return results.summary(time.perf_counter() - started)
+
+async def run_load_test(url: str | None, weights: dict[str, int], concurrency: int, duration: float, requests: int, warmup: int, seed: int):
+    with Session(engine) as session:
+        workload = Workload(session, random.Random(seed))
+    timeout = httpx.Timeout(60)
+    # 下单和订单历史需要令牌，以管理员身份代所有用户请求；对 --url 压测时服务端须配置相同的 AUTH_SECRET_KEY
+    headers = {"Authorization": f"Bearer {create_access_token(0, 'admin')['access_token']}"}
+    if url is not None:
+        async with httpx.AsyncClient(base_url=url, timeout=timeout, headers=headers) as client:
+            return await run(client, workload, weights, concurrency, duration, requests, warmup)
+
+    # 进程内运行：请求经 ASGI 直接交给应用，包含中间件和线程池，不经过网络
+    from main import app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=timeout, headers=headers) as client:
+            return await run(client, workload, weights, concurrency, duration, requests, warmup)
+
+def print_summary(rows: dict):
+    print(f"{'endpoint':<10}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}  statuses")
+    for name, row in rows.items():
+        print(f"{name:<10}{row['requests']:>10}{row['errors']:>8}{row['throughput']:>10.1f}{row['p50_ms']:>10.1f}"
+              f"{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}  {row.get('statuses', '')}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive a mix of searches, bookings and order history lookups and report latency percentiles")
+    parser.add_argument("--url", help="base URL of a running server, e.g. http://localhost:8080/api; default runs the app in-process")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"request weights, default {DEFAULT_MIX}")
+    parser.add_argument("--concurrency", type=int, default=16, help="number of concurrent clients")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many requests, 0 for no limit")
+    parser.add_argument("--warmup", type=int, default=100, help="requests sent before measuring")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = parser.parse_args()
+    if args.concurrency < 1:
+        parser.error("--concurrency must be positive")
+
+    try:
+        rows = asyncio.run(run_load_test(args.url, args.mix, args.concurrency, args.duration, args.requests, args.warmup, args.seed))
+    except ValueError as exception:
+        print(exception)
+        sys.exit(1)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print_summary(rows)
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,56 @@
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sql.database import engine, SQLModel
+from contextlib import asynccontextmanager
+import os
+import asyncio
+from anyio import to_thread
+from sqlmodel import Session, select
+from sql.database import engine, SQLModel, DATABASE_POOL_SIZE, DATABASE_MAX_OVERFLOW
+from sql.migrations import run_migrations
+from sql.inventory import seat_inventory
+from sql.security import auth_cache, run_auth_refresher
+from sql.models import StationPair, Route
+from sql.crud import rebuild_all_station_pairs
+from sql.sweeper import run_order_sweeper
+from sql.dashboard import dashboard, run_dashboard_refresher
+from sql.pagination import NEXT_CURSOR_HEADER
+from sql.instrumentation import instrument, start_request, finish_request, query_stats_headers, DB_QUERY_COUNT_HEADER, DB_TIME_HEADER
+from sql import metrics
 from routers import users, stations, trains, carriages, trainrunnums, trainruns, orders, admin
 import uvicorn
 
+# 路由函数均为同步函数，由线程池执行；默认线程数与连接池上限一致，线程不会因等待数据库连接而空占
+THREADPOOL_SIZE = int(os.environ.get("THREADPOOL_SIZE", DATABASE_POOL_SIZE + DATABASE_MAX_OVERFLOW))
+
 def create_db_and_tables():
+    # create_all 只新建缺失的表，已有表的新增列和索引由迁移补齐
     SQLModel.metadata.create_all(engine)
-app = FastAPI(root_path="/api")
+    run_migrations(engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    # 启动时从数据库重建已上线车次的座位库存
+    with Session(engine) as session:
+        # 旧数据库中还没有起讫站索引时补建一次
+        if session.exec(select(StationPair.id)).first() is None and session.exec(select(Route.id)).first() is not None:
+            rebuild_all_station_pairs(session)
+        seat_inventory.rebuild(session)
+        auth_cache.load(session)
+        dashboard.refresh(session)
+    sweeper = asyncio.create_task(run_order_sweeper())
+    dashboard_refresher = asyncio.create_task(run_dashboard_refresher())
+    auth_refresher = asyncio.create_task(run_auth_refresher())
+    yield
+    sweeper.cancel()
+    dashboard_refresher.cancel()
+    auth_refresher.cancel()
+
+# 按请求统计 SQL 条数与耗时，写入响应头和日志，超过阈值的语句抽样记录到慢查询日志
+instrument(engine)
+
+app = FastAPI(root_path="/api", lifespan=lifespan)
 app.include_router(users.router)
 app.include_router(stations.router)
 app.include_router(trains.router)
@@ -30,8 +74,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, DB_QUERY_COUNT_HEADER, DB_TIME_HEADER],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    stats, token = start_request(f"{request.method} {request.url.path}")
+    metrics.http_requests_in_progress.inc()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        finish_request(stats, token)
+        metrics.http_requests_in_progress.dec()
+        # 按路由模板而不是实际路径统计，避免标签数量随 id 增长
+        route = request.scope.get("route")
+        route = route.path if route is not None else "unmatched"
+        metrics.http_request_duration.observe(time.perf_counter() - started, request.method, route)
+        metrics.http_requests.inc(request.method, route, status)
+        metrics.db_queries.inc(request.method, route, value=stats.count)
+        metrics.db_seconds.inc(request.method, route, value=stats.seconds)
+    response.headers.update(query_stats_headers(stats))
+    return response
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/")
 def read_root():
     return {"Hello": "World"}
@@ -3,8 +3,13 @@ from sqlmodel import Session
 from typing import Annotated
 from enum import Enum
 from sql.database import engine
-from sql.schemas import AdminLogin, AdminOut
-from sql.crud import authenticate_admin, get_count
+from sql.schemas import AdminLogin, AdminOut, Token, DashboardOut
+from sql.crud import authenticate_admin, get_count, issue_admin_token
+from sql.security import claimsDepends, check_admin_access
+from sql.inventory import seat_inventory
+from sql.cache import search_cache
+from sql.journey import journey_planner
+from sql.dashboard import dashboard
 
 class CountQueryEnum(str, Enum):
     users = "users"
@@ -29,8 +34,33 @@ router = APIRouter(
 
 @router.post("/login", response_model=AdminOut)
 async def check_admin_login(admin: AdminLogin, session: sessionDepends):
-    return authenticate_admin(admin, session)
+    return await authenticate_admin(admin, session)
+
+@router.post("/token", response_model=Token)
+async def create_admin_token(admin: AdminLogin, session: sessionDepends):
+    return await issue_admin_token(admin, session)
 
 @router.get("/count")
-async def get_admin_count(query: CountQueryEnum, session: sessionDepends):
-    return get_count(query, session)
\ No newline at end of file
+def get_admin_count(query: CountQueryEnum, claims: claimsDepends, session: sessionDepends):
+    check_admin_access(claims)
+    return get_count(query, session)
+
+@router.get("/dashboard", response_model=DashboardOut)
+def get_admin_dashboard(claims: claimsDepends):
+    check_admin_access(claims)
+    return dashboard.stats()
+
+@router.get("/inventory")
+def get_admin_inventory_stats(claims: claimsDepends):
+    check_admin_access(claims)
+    return seat_inventory.stats()
+
+@router.get("/search_cache")
+def get_admin_search_cache_stats(claims: claimsDepends):
+    check_admin_access(claims)
+    return search_cache.stats()
+
+@router.get("/journey_cache")
+def get_admin_journey_cache_stats(claims: claimsDepends):
+    check_admin_access(claims)
+    return journey_planner.stats()
\ No newline at end of file
@@ -18,11 +18,11 @@ router = APIRouter(
 )
 
 @router.get("/{carriage_id}", response_model=CarriageOutWithTrain)
-async def read_carriage(carriage_id: int, session: sessionDepends):
+def read_carriage(carriage_id: int, session: sessionDepends):
     return get_carriage(carriage_id, session)
 
 @router.post("/create", response_model=CarriageOut)
-async def create_carriage(carriage: CarriageCreate, session: sessionDepends):
+def create_carriage(carriage: CarriageCreate, session: sessionDepends):
     return add_carriage(carriage, session)
 
 @router.delete("/{carriage_id}")
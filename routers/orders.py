@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response, HTTPException, Query
 from sqlmodel import Session
 from typing import Annotated, List
+from datetime import datetime
 from sql.database import engine
-from sql.schemas import OrderCreate, OrderOut, OrderOutWithTicket
-from sql.crud import get_order, get_orders_by_user, add_order, complete_order, cancel_order, remove_order, get_orders
+from sql.models import OrderStatus
+from sql.pagination import set_next_cursor, MAX_PAGE_SIZE
+from sql.metrics import record_booking_failures
+from sql.schemas import OrderCreate, OrderBatchCreate, OrderOut, OrderOutWithTicket
+from sql.crud import get_order, get_orders_by_user, add_order, add_orders, complete_order, cancel_order, remove_order, get_orders, get_order_user_id
+from sql.security import TokenClaims, claimsDepends, check_user_access, check_admin_access
 
 def get_session():
     with Session(engine) as session:
@@ -11,6 +16,11 @@ def get_session():
 
 sessionDepends = Annotated[Session, Depends(get_session)]
 
+def check_order_access(claims: TokenClaims | None, order_id: int, session: Session):
+    # 只有携带普通用户令牌时才需要查询订单所属用户
+    if claims is not None and not claims.is_admin:
+        check_user_access(claims, get_order_user_id(order_id, session))
+
 router = APIRouter(
     prefix="/orders",
     tags=["orders"],
@@ -18,29 +28,51 @@ router = APIRouter(
 )
 
 @router.get("/{order_id}", response_model=OrderOutWithTicket)
-async def read_order(order_id: int, session: sessionDepends):
+def read_order(order_id: int, claims: claimsDepends, session: sessionDepends):
+    check_order_access(claims, order_id, session)
     return get_order(order_id, session)
 
 @router.get("/", response_model=List[OrderOutWithTicket])
-async def read_orders(offset: int = 0, limit: int = 10, session: Session = Depends(get_session)):
-    return get_orders(offset, limit, session)
+def read_orders(response: Response, claims: claimsDepends, offset: int = Query(0, ge=0), limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE), cursor: str | None = None, status: OrderStatus | None = None,
+                      created_from: datetime | None = None, created_to: datetime | None = None, session: Session = Depends(get_session)):
+    check_admin_access(claims)
+    orders, next_cursor = get_orders(offset, limit, session, cursor, status, created_from, created_to)
+    set_next_cursor(response, next_cursor)
+    return orders
 
 @router.get("/user/{user_id}", response_model=List[OrderOutWithTicket])
-async def read_orders_by_user(user_id: int, session: sessionDepends):
-    return get_orders_by_user(user_id, session)
+def read_orders_by_user(user_id: int, response: Response, claims: claimsDepends, limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE), cursor: str | None = None, status: OrderStatus | None = None,
+                              created_from: datetime | None = None, created_to: datetime | None = None, session: Session = Depends(get_session)):
+    check_user_access(claims, user_id)
+    orders, next_cursor = get_orders_by_user(user_id, limit, session, cursor, status, created_from, created_to)
+    set_next_cursor(response, next_cursor)
+    return orders
 
 @router.post("/create", response_model=OrderOut)
-async def create_order(order: OrderCreate, session: sessionDepends):
-    return add_order(order, session)
+def create_order(order: OrderCreate, claims: claimsDepends, session: sessionDepends):
+    check_user_access(claims, order.user_id)
+    with record_booking_failures():
+        return add_order(order, session)
+
+@router.post("/create_batch", response_model=List[OrderOut])
+def create_orders(orders: OrderBatchCreate, claims: claimsDepends, session: sessionDepends):
+    # 批量订票时下单人须是乘客之一
+    if claims is not None and not claims.is_admin and claims.subject not in orders.user_ids:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    with record_booking_failures():
+        return add_orders(orders, session)
 
 @router.patch("/{order_id}/complete", response_model=OrderOut)
-def set_order_completed(order_id: int, session: sessionDepends):
+def set_order_completed(order_id: int, claims: claimsDepends, session: sessionDepends):
+    check_order_access(claims, order_id, session)
     return complete_order(order_id, session)
 
 @router.patch("/{order_id}/cancel", response_model=OrderOut)
-def set_order_cancelled(order_id: int, session: sessionDepends):
+def set_order_cancelled(order_id: int, claims: claimsDepends, session: sessionDepends):
+    check_order_access(claims, order_id, session)
     return cancel_order(order_id, session)
 
 @router.delete("/{order_id}")
-def delete_order(order_id: int, session: sessionDepends):
+def delete_order(order_id: int, claims: claimsDepends, session: sessionDepends):
+    check_order_access(claims, order_id, session)
     return remove_order(order_id, session)
\ No newline at end of file
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response
 from sqlmodel import Session
 from typing import Annotated, List
 from sql.database import engine
+from sql.pagination import set_next_cursor
 from sql.schemas import StationCreate, StationOut, StationUpdate, StationDeprecate
 from sql.crud import get_station, add_station, remove_station, modify_station, set_station_deprecated, get_stations
 
@@ -18,15 +19,17 @@ router = APIRouter(
 )
 
 @router.get("/{station_id}", response_model=StationOut)
-async def read_station(station_id: int, session: sessionDepends):
+def read_station(station_id: int, session: sessionDepends):
     return get_station(station_id, session)
 
 @router.get("/", response_model=List[StationOut])
-async def read_stations(offset: int = 0, limit: int = 10, session: Session = Depends(get_session)):
-    return get_stations(offset, limit, session)
+def read_stations(response: Response, offset: int = 0, limit: int = 10, cursor: str | None = None, session: Session = Depends(get_session)):
+    stations, next_cursor = get_stations(offset, limit, session, cursor)
+    set_next_cursor(response, next_cursor)
+    return stations
 
 @router.post("/create", response_model=StationOut)
-async def create_station(station: StationCreate, session: sessionDepends):
+def create_station(station: StationCreate, session: sessionDepends):
     return add_station(station, session)
 
 @router.delete("/{station_id}")
@@ -34,7 +37,7 @@ def delete_station(station_id: int, session: sessionDepends):
     return remove_station(station_id, session)
 
 @router.patch("/{station_id}", response_model=StationOut)
-async def update_station(station_id: int, station: StationUpdate, session: sessionDepends):
+def update_station(station_id: int, station: StationUpdate, session: sessionDepends):
     return modify_station(station_id, station, session)
 
 @router.patch("/{station_id}/deprecated", response_model=StationOut)
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response
 from sqlmodel import Session
 from typing import Annotated, List
 from sql.database import engine
+from sql.pagination import set_next_cursor
 from sql.schemas import TrainRunNumCreate, TrainRunNumOut, TrainRunNumOutWithRoutes, TrainRunNumUpdate, TrainRunNumDeprecate
 from sql.schemas import RouteOut, RouteOutWithTrainRunNum, RouteUpdate
 from sql.crud import get_train_run_num, add_train_run_num, remove_train_run_num, modify_train_run_num, set_train_run_num_deprecated, get_train_run_nums
@@ -20,15 +21,17 @@ router = APIRouter(
 )
 
 @router.get("/{train_run_num_id}", response_model=TrainRunNumOutWithRoutes)
-async def read_train_run_num(train_run_num_id: int, session: sessionDepends):
+def read_train_run_num(train_run_num_id: int, session: sessionDepends):
     return get_train_run_num(train_run_num_id, session)
 
 @router.get("/", response_model=List[TrainRunNumOut])
-async def read_train_run_nums(offset: int = 0, limit: int = 10, session: Session = Depends(get_session)):
-    return get_train_run_nums(offset, limit, session)
+def read_train_run_nums(response: Response, offset: int = 0, limit: int = 10, cursor: str | None = None, session: Session = Depends(get_session)):
+    train_run_nums, next_cursor = get_train_run_nums(offset, limit, session, cursor)
+    set_next_cursor(response, next_cursor)
+    return train_run_nums
 
 @router.post("/create", response_model=TrainRunNumOut)
-async def create_train_run_num(train_run_num: TrainRunNumCreate, session: sessionDepends):
+def create_train_run_num(train_run_num: TrainRunNumCreate, session: sessionDepends):
     return add_train_run_num(train_run_num, session)
 
 @router.delete("/{train_run_num_id}")
@@ -36,7 +39,7 @@ def delete_train_run_num(train_run_num_id: int, session: sessionDepends):
     return remove_train_run_num(train_run_num_id, session)
 
 @router.patch("/{train_run_num_id}", response_model=TrainRunNumOut)
-async def update_train_run_num(train_run_num_id: int, train_run_num: TrainRunNumUpdate, session: sessionDepends):
+def update_train_run_num(train_run_num_id: int, train_run_num: TrainRunNumUpdate, session: sessionDepends):
     return modify_train_run_num(train_run_num_id, train_run_num, session)
 
 @router.patch("/{train_run_num_id}/deprecated", response_model=TrainRunNumOut)
@@ -44,9 +47,9 @@ def deprecate_train_run_num(train_run_num_id: int, train_run_num: TrainRunNumDep
     return set_train_run_num_deprecated(train_run_num_id, train_run_num.deprecated, session)
 
 @router.get("/route/{route_id}", response_model=RouteOutWithTrainRunNum)
-async def read_route(route_id: int, session: sessionDepends):
+def read_route(route_id: int, session: sessionDepends):
     return get_route(route_id, session)
 
 @router.patch("/route/{route_id}", response_model=RouteOut)
-async def update_route(route_id: int, route: RouteUpdate, session: sessionDepends):
+def update_route(route_id: int, route: RouteUpdate, session: sessionDepends):
     return modify_route(route_id, route, session)
\ No newline at end of file
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response
 from sqlmodel import Session
 from typing import Annotated, List
+from datetime import date
 from sql.database import engine
-from sql.schemas import TrainRunCreate, TrainRunOut, TrainRunOutWithTrain, TrainRunUpdate, TrainRunFinish, TrainRunOutWithTrainRunNum, TrainRunDemand
-from sql.crud import get_train_run, add_train_run, remove_train_run, modify_train_run, set_train_run_finished, get_train_runs_by_demand, get_train_runs
+from sql.pagination import set_next_cursor
+from sql.schemas import TrainRunCreate, TrainRunSchedule, TrainRunOut, TrainRunOutWithTrain, TrainRunUpdate, TrainRunFinish, TrainRunOutWithTrainRunNum, TrainRunDemand, TrainRunAvailability, TrainRunQuote, JourneyDemand, Journey
+from sql.crud import get_train_run, add_train_run, add_train_run_schedule, remove_train_run, modify_train_run, set_train_run_finished, search_train_runs, get_train_runs, get_train_run_availability, get_train_run_quote, get_journeys
 
 def get_session():
     with Session(engine) as session:
@@ -18,27 +20,46 @@ router = APIRouter(
 )
 
 @router.get("/{train_run_id}", response_model=TrainRunOutWithTrain)
-async def read_train_run(train_run_id: int, session: sessionDepends):
+def read_train_run(train_run_id: int, session: sessionDepends):
     return get_train_run(train_run_id, session)
 
 @router.get("/", response_model=List[TrainRunOutWithTrain])
-async def read_train_runs(offset: int = 0, limit: int = 10, session: Session = Depends(get_session)):
-    return get_train_runs(offset, limit, session)
+def read_train_runs(response: Response, offset: int = 0, limit: int = 10, cursor: str | None = None, train_run_num_id: int | None = None,
+                          running_date_from: date | None = None, running_date_to: date | None = None, session: Session = Depends(get_session)):
+    train_runs, next_cursor = get_train_runs(offset, limit, session, cursor, train_run_num_id, running_date_from, running_date_to)
+    set_next_cursor(response, next_cursor)
+    return train_runs
+
+@router.get("/{train_run_id}/availability", response_model=TrainRunAvailability)
+def read_train_run_availability(train_run_id: int, start_seq: int, end_seq: int, session: sessionDepends):
+    return get_train_run_availability(train_run_id, start_seq, end_seq, session)
+
+@router.get("/{train_run_id}/quote", response_model=TrainRunQuote)
+def read_train_run_quote(train_run_id: int, start_seq: int, end_seq: int, session: sessionDepends):
+    return get_train_run_quote(train_run_id, start_seq, end_seq, session)
 
 @router.post("/demand", response_model=List[TrainRunOutWithTrainRunNum])
-async def read_train_runs_by_demand(demand: TrainRunDemand, session: sessionDepends):
-    return get_train_runs_by_demand(demand, session)
+def read_train_runs_by_demand(demand: TrainRunDemand, session: sessionDepends):
+    return Response(content=search_train_runs(demand, session), media_type="application/json")
+
+@router.post("/journeys", response_model=List[Journey])
+def read_journeys(demand: JourneyDemand, session: sessionDepends):
+    return get_journeys(demand, session)
 
 @router.post("/create", response_model=TrainRunOut)
-async def create_train_run(train_run: TrainRunCreate, session: sessionDepends):
+def create_train_run(train_run: TrainRunCreate, session: sessionDepends):
     return add_train_run(train_run, session)
 
+@router.post("/schedule", response_model=List[TrainRunOut])
+def create_train_run_schedule(schedule: TrainRunSchedule, session: sessionDepends):
+    return add_train_run_schedule(schedule, session)
+
 @router.delete("/{train_run_id}")
 def delete_train_run(train_run_id: int, session: sessionDepends):
     return remove_train_run(train_run_id, session)
 
 @router.patch("/{train_run_id}", response_model=TrainRunOut)
-async def update_train_run(train_run_id: int, train_run: TrainRunUpdate, session: sessionDepends):
+def update_train_run(train_run_id: int, train_run: TrainRunUpdate, session: sessionDepends):
     return modify_train_run(train_run_id, train_run, session)
 
 @router.patch("/{train_run_id}/finished", response_model=TrainRunOut)
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response
 from sqlmodel import Session
 from typing import Annotated, List
 from sql.database import engine
+from sql.pagination import set_next_cursor
 from sql.schemas import TrainCreate, TrainOut, TrainOutWithCarriages, TrainUpdate, TrainDeprecate
 from sql.crud import get_train, add_train, remove_train, modify_train, set_train_deprecated, get_trains
 
@@ -18,15 +19,17 @@ router = APIRouter(
 )
 
 @router.get("/{train_id}", response_model=TrainOutWithCarriages)
-async def read_train(train_id: int, session: sessionDepends):
+def read_train(train_id: int, session: sessionDepends):
     return get_train(train_id, session)
 
 @router.get("/", response_model=List[TrainOut])
-async def read_trains(offset: int = 0, limit: int = 10, session: Session = Depends(get_session)):
-    return get_trains(offset, limit, session)
+def read_trains(response: Response, offset: int = 0, limit: int = 10, cursor: str | None = None, session: Session = Depends(get_session)):
+    trains, next_cursor = get_trains(offset, limit, session, cursor)
+    set_next_cursor(response, next_cursor)
+    return trains
 
 @router.post("/create", response_model=TrainOut)
-async def create_train(train: TrainCreate, session: sessionDepends):
+def create_train(train: TrainCreate, session: sessionDepends):
     return add_train(train, session)
 
 @router.delete("/{train_id}")
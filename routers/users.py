@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Response, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlmodel import Session
 from typing import Annotated, List
 from sql.database import engine
-from sql.schemas import UserCreate, UserOut, UserUpdate, UserBan, UserLogin
-from sql.crud import get_user, add_user, remove_user, modify_user, set_user_ban, authenticate_user, get_users
+from sql.pagination import set_next_cursor
+from sql.schemas import UserCreate, UserOut, UserUpdate, UserBan, UserLogin, Token
+from sql.crud import get_user, add_user, remove_user, modify_user, set_user_ban, authenticate_user, get_users, issue_user_token
+from sql.security import hash_password_async, auth_cache, claimsDepends, currentClaimsDepends, check_user_access, check_admin_access
 
 def get_session():
     with Session(engine) as session:
@@ -17,30 +20,55 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+@router.get("/me", response_model=UserOut)
+def read_current_user(claims: currentClaimsDepends, session: sessionDepends):
+    if claims.is_admin:
+        raise HTTPException(status_code=403, detail="Permission denied")
+    return get_user(claims.subject, session)
+
 @router.get("/{user_id}", response_model=UserOut)
-async def read_user(user_id: int, session: sessionDepends):
+def read_user(user_id: int, claims: claimsDepends, session: sessionDepends):
+    check_user_access(claims, user_id)
     return get_user(user_id, session)
 
 @router.get("/", response_model=List[UserOut])
-async def read_users(offset: int = 0, limit: int = 10, session: Session = Depends(get_session)):
-    return get_users(offset, limit, session)
+def read_users(response: Response, claims: claimsDepends, offset: int = 0, limit: int = 10, cursor: str | None = None, session: Session = Depends(get_session)):
+    check_admin_access(claims)
+    users, next_cursor = get_users(offset, limit, session, cursor)
+    set_next_cursor(response, next_cursor)
+    return users
 
+# 登录与设置密码需要计算哈希，使用异步接口，哈希计算期间不占用线程池和数据库连接
 @router.post("/login", response_model=UserOut)
 async def check_user_login(user: UserLogin, session: sessionDepends):
-    return authenticate_user(user, session)
+    return await authenticate_user(user, session)
+
+@router.post("/token", response_model=Token)
+async def create_user_token(user: UserLogin, session: sessionDepends):
+    return await issue_user_token(user, session)
+
+@router.post("/logout")
+def logout_user(claims: currentClaimsDepends):
+    auth_cache.revoke_token(claims)
+    return {"message": "Logged out successfully"}
 
 @router.post("/create", response_model=UserOut)
 async def create_user(user: UserCreate, session: sessionDepends):
-    return add_user(user, session)
+    password_hash = await hash_password_async(user.password)
+    return await run_in_threadpool(add_user, user, session, password_hash)
 
 @router.delete("/{user_id}")
-def delete_user(user_id: int, session: sessionDepends):
+def delete_user(user_id: int, claims: claimsDepends, session: sessionDepends):
+    check_user_access(claims, user_id)
     return remove_user(user_id, session)
 
 @router.patch("/{user_id}", response_model=UserOut)
-async def update_user(user_id: int, user: UserUpdate, session: sessionDepends):
-    return modify_user(user_id, user, session)
+async def update_user(user_id: int, user: UserUpdate, claims: claimsDepends, session: sessionDepends):
+    check_user_access(claims, user_id)
+    password_hash = await hash_password_async(user.password) if user.password is not None else None
+    return await run_in_threadpool(modify_user, user_id, user, session, password_hash)
 
 @router.patch("/{user_id}/banned", response_model=UserOut)
-def ban_user(user_id: int, user: UserBan, session: sessionDepends):
+def ban_user(user_id: int, user: UserBan, claims: claimsDepends, session: sessionDepends):
+    check_admin_access(claims)
     return set_user_ban(user_id, user.banned, session)
\ No newline at end of file
@@ -0,0 +1,145 @@
+import os
+import random
+import argparse
+
+
+# 每个策略接收按车厢、座位排好序的座位列表，返回 (选中的座位, 检查过的座位数)
+def first_fit(slots, mask: int, full_mask: int):
+    # 先找能拼入的半占用座位，没有再取第一个空座位
+    empty = None
+    for inspected, slot in enumerate(slots, 1):
+        if slot.occupancy & full_mask == 0:
+            if empty is None:
+                empty = slot
+                if mask == full_mask:
+                    return empty, inspected
+        elif slot.occupancy & mask == 0:
+            return slot, inspected
+    return empty, len(slots)
+
+def best_fit(slots, mask: int, full_mask: int):
+    # 选择占用后剩余空闲区段最少的座位，减少座位被切碎
+    best = None
+    best_left = 0
+    for inspected, slot in enumerate(slots, 1):
+        if slot.occupancy & mask:
+            continue
+        left = (full_mask & ~(slot.occupancy | mask)).bit_count()
+        if best is None or left < best_left:
+            best, best_left = slot, left
+            if left == 0:
+                return best, inspected
+    return best, len(slots)
+
+def same_carriage(slots, mask: int, full_mask: int):
+    # 在第一个有空位的车厢内做最佳适配，使乘客集中在较少的车厢
+    best = None
+    best_left = 0
+    for inspected, slot in enumerate(slots, 1):
+        if best is not None and slot.carriage_id != best.carriage_id:
+            return best, inspected - 1
+        if slot.occupancy & mask:
+            continue
+        left = (full_mask & ~(slot.occupancy | mask)).bit_count()
+        if best is None or left < best_left:
+            best, best_left = slot, left
+            if left == 0:
+                return best, inspected
+    return best, len(slots)
+
+allocation_strategies = {
+    "first_fit": first_fit,
+    "best_fit": best_fit,
+    "same_carriage": same_carriage,
+}
+
+SEAT_ALLOCATION_STRATEGY = os.environ.get("SEAT_ALLOCATION_STRATEGY", "first_fit")
+if SEAT_ALLOCATION_STRATEGY not in allocation_strategies:
+    raise ValueError(f"Unknown seat allocation strategy: {SEAT_ALLOCATION_STRATEGY}")
+
+allocate = allocation_strategies[SEAT_ALLOCATION_STRATEGY]
+
+
+# 模拟器：回放订票记录，比较各策略的上座率与平均检查座位数
+class SimulatedSlot:
+    __slots__ = ("id", "carriage_id", "occupancy")
+
+    def __init__(self, id: int, carriage_id: int):
+        self.id = id
+        self.carriage_id = carriage_id
+        self.occupancy = 0
+
+
+def random_trace(hops: int, bookings: int, cancel_rate: float = 0.05, seed: int = 0):
+    # 记录项为 ("book", start_seq, end_seq) 或 ("cancel", 第几次订票)
+    rng = random.Random(seed)
+    trace = []
+    booked = 0
+    for _ in range(bookings):
+        if booked and rng.random() < cancel_rate:
+            trace.append(("cancel", rng.randrange(booked)))
+            continue
+        start_seq = rng.randint(1, hops)
+        end_seq = rng.randint(start_seq + 1, hops + 1)
+        trace.append(("book", start_seq, end_seq))
+        booked += 1
+    return trace
+
+def simulate(trace, strategy, hops: int, carriages: int, seats_per_carriage: int):
+    slots = [
+        SimulatedSlot(carriage * seats_per_carriage + seat, carriage)
+        for carriage in range(carriages)
+        for seat in range(seats_per_carriage)
+    ]
+    full_mask = (1 << hops) - 1
+    bookings = []
+    inspected_total = 0
+    attempts = 0
+    rejected = 0
+    for event in trace:
+        if event[0] == "cancel":
+            booking = bookings[event[1]] if event[1] < len(bookings) else None
+            if booking is not None:
+                slot, mask = booking
+                slot.occupancy &= ~mask
+                bookings[event[1]] = None
+            continue
+        _, start_seq, end_seq = event
+        mask = ((1 << (end_seq - start_seq)) - 1) << (start_seq - 1)
+        slot, inspected = strategy(slots, mask, full_mask)
+        attempts += 1
+        inspected_total += inspected
+        if slot is None:
+            rejected += 1
+            bookings.append(None)
+            continue
+        slot.occupancy |= mask
+        bookings.append((slot, mask))
+
+    sold = sum(slot.occupancy.bit_count() for slot in slots)
+    return {
+        "load_factor": sold / (len(slots) * hops),
+        "avg_slots_inspected": inspected_total / attempts if attempts else 0.0,
+        "rejected": rejected,
+        "opened_slots": sum(1 for slot in slots if slot.occupancy),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a booking trace against each seat allocation strategy")
+    parser.add_argument("--hops", type=int, default=12)
+    parser.add_argument("--carriages", type=int, default=16)
+    parser.add_argument("--seats", type=int, default=64, help="seats per carriage")
+    parser.add_argument("--bookings", type=int, default=4000)
+    parser.add_argument("--cancel-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    trace = random_trace(args.hops, args.bookings, args.cancel_rate, args.seed)
+    for name, strategy in allocation_strategies.items():
+        result = simulate(trace, strategy, args.hops, args.carriages, args.seats)
+        print(f"{name:<14} load_factor={result['load_factor']:.3f} "
+              f"avg_slots_inspected={result['avg_slots_inspected']:.1f} "
+              f"rejected={result['rejected']} opened_slots={result['opened_slots']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from datetime import date
+
+SEARCH_CACHE_SIZE = int(os.environ.get("SEARCH_CACHE_SIZE", 1024))
+SEARCH_CACHE_TTL_SECONDS = float(os.environ.get("SEARCH_CACHE_TTL_SECONDS", 60))
+
+
+class SearchEntry:
+    __slots__ = ("content", "expires_at", "running_date", "endpoints", "train_run_num_ids", "station_ids")
+
+    def __init__(self, content: bytes, expires_at: float, running_date: date, endpoints: set[int], train_run_num_ids: set[int], station_ids: set[int]):
+        self.content = content
+        self.expires_at = expires_at
+        self.running_date = running_date
+        # 起讫站编号；station_ids 还包含结果中各线路经过的车站
+        self.endpoints = endpoints
+        self.train_run_num_ids = train_run_num_ids
+        self.station_ids = station_ids | endpoints
+
+
+class SearchCache:
+    def __init__(self, maxsize: int = SEARCH_CACHE_SIZE, ttl: float = SEARCH_CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[tuple, SearchEntry] = OrderedDict()
+        # 反向索引，用于按日期、车次标识、车站精确失效
+        self._by_date: dict[date, set[tuple]] = {}
+        self._by_train_run_num: dict[int, set[tuple]] = {}
+        self._by_station: dict[int, set[tuple]] = {}
+        self._lock = threading.Lock()
+        # 每次失效加一，查询期间发生过失效的结果不写入缓存
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.content
+
+    def put(self, key: tuple, content: bytes, generation: int, running_date: date, endpoints: set[int], train_run_num_ids: set[int], station_ids: set[int]):
+        with self._lock:
+            if generation != self.generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            entry = SearchEntry(content, time.monotonic() + self.ttl, running_date, endpoints, train_run_num_ids, station_ids)
+            self._entries[key] = entry
+            self._by_date.setdefault(running_date, set()).add(key)
+            for train_run_num_id in train_run_num_ids:
+                self._by_train_run_num.setdefault(train_run_num_id, set()).add(key)
+            for station_id in entry.station_ids:
+                self._by_station.setdefault(station_id, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _discard(self, index: dict, value, key: tuple):
+        keys = index.get(value)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del index[value]
+
+    def _remove(self, key: tuple):
+        entry = self._entries.pop(key)
+        self._discard(self._by_date, entry.running_date, key)
+        for train_run_num_id in entry.train_run_num_ids:
+            self._discard(self._by_train_run_num, train_run_num_id, key)
+        for station_id in entry.station_ids:
+            self._discard(self._by_station, station_id, key)
+
+    def _invalidate(self, keys):
+        self.generation += 1
+        for key in list(keys):
+            if key in self._entries:
+                self._remove(key)
+                self.invalidations += 1
+
+    def invalidate_date(self, running_date: date):
+        with self._lock:
+            self._invalidate(self._by_date.get(running_date, ()))
+
+    def invalidate_station(self, station_id: int):
+        with self._lock:
+            self._invalidate(self._by_station.get(station_id, ()))
+
+    def invalidate_train_run_num(self, train_run_num_id: int, station_ids: set[int]):
+        # 结果中含有该车次标识的查询，以及起讫站都在该线路上的查询（可能新增匹配）
+        with self._lock:
+            keys = set(self._by_train_run_num.get(train_run_num_id, ()))
+            for station_id in station_ids:
+                for key in self._by_station.get(station_id, ()):
+                    if self._entries[key].endpoints <= station_ids:
+                        keys.add(key)
+            self._invalidate(keys)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._by_date.clear()
+            self._by_train_run_num.clear()
+            self._by_station.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+search_cache = SearchCache()
@@ -1,16 +1,46 @@
 from fastapi import HTTPException
-from sqlmodel import Session, select, func
-from datetime import datetime
+from fastapi.concurrency import run_in_threadpool
+from pydantic import TypeAdapter
+from typing import List
+from sqlmodel import Session, select, update, insert, delete, case, literal, or_, and_
+from sqlalchemy.orm import joinedload, selectinload
+from datetime import datetime, timedelta, date
 from sql.models import User, Train, Carriage, Seat, Station, TrainRunNum, Route, TrainRun, Ticket, TicketSlot, Order, Admin
+from sql.models import TicketSlotStatus, StationPair, OrderStatus, MAX_ROUTE_STOPS
 from sql.schemas import UserCreate, UserUpdate, UserLogin, AdminLogin
 from sql.schemas import CarriageCreate, CarriageUpdate
 from sql.schemas import StationCreate, StationUpdate
 from sql.schemas import TrainCreate, TrainUpdate
-from sql.schemas import TrainRunNumCreate, TrainRunNumUpdate, TrainRunDemand
+from sql.schemas import TrainRunNumCreate, TrainRunNumUpdate, TrainRunDemand, TrainRunOutWithTrainRunNum, JourneyDemand
 from sql.schemas import RouteUpdate
-from sql.schemas import TrainRunCreate, TrainRunUpdate
-from sql.schemas import OrderCreate
+from sql.schemas import TrainRunCreate, TrainRunUpdate, TrainRunSchedule
+from sql.schemas import OrderCreate, OrderBatchCreate
 from sql.schemas import AdminLogin
+from sql.inventory import seat_inventory
+from sql.fares import fare_engine
+from sql.cache import search_cache
+from sql.journey import journey_planner, to_minutes, to_time, MAX_TRANSFERS
+from sql.pagination import paginate, encode_cursor, decode_cursor, MAX_PAGE_SIZE
+from sql.metrics import orders as order_events
+from sql.dashboard import dashboard
+from sql.security import hash_password, hash_password_async, verify_password_async, password_needs_rehash, create_access_token, auth_cache
+
+# 各读取接口的预加载方案，与响应模型的嵌套结构一一对应，避免序列化时逐条懒加载
+# 多对一关系用 joinedload 合并进同一条查询，一对多关系用 selectinload 额外一条查询
+order_with_ticket_options = (
+    joinedload(Order.ticket).joinedload(Ticket.ticket_slot).options(
+        joinedload(TicketSlot.train_run).options(joinedload(TrainRun.train), joinedload(TrainRun.train_run_num)),
+        joinedload(TicketSlot.seat).joinedload(Seat.carriage)
+    ),
+)
+carriage_with_train_options = (joinedload(Carriage.train),)
+train_with_carriages_options = (selectinload(Train.carriages),)
+train_run_num_with_routes_options = (selectinload(TrainRunNum.routes).joinedload(Route.station),)
+route_with_train_run_num_options = (joinedload(Route.train_run_num), joinedload(Route.station))
+train_run_with_train_options = (joinedload(TrainRun.train), joinedload(TrainRun.train_run_num))
+train_run_with_routes_options = (
+    joinedload(TrainRun.train_run_num).selectinload(TrainRunNum.routes).joinedload(Route.station),
+)
 
 train_dict = {
     "fast": ["second_class", "first_class", "business"],
@@ -31,37 +61,43 @@ seat_num_dict = {
     "first_class": ["A", "C", "D", "F"],
     "business": ["A", "C", "F"]
 }
-price_multiple_dict = {
-    "fast": 0.45,
-    "slow": 0.3,
-    "second_class": 1,
-    "first_class": 2,
-    "business": 4
-}
 
 # Admin
-def authenticate_admin(admin: AdminLogin, session: Session):
-    admin = session.exec(select(Admin).where(Admin.name == admin.name, Admin.password == admin.password)).one()
-    if admin is None:
+async def authenticate_admin(admin: AdminLogin, session: Session):
+    db_admin = await authenticate_account(Admin, admin.name, admin.password, session)
+    if db_admin is None:
         raise HTTPException(status_code=404, detail="Admin not found")
-    return admin
+    return db_admin
+
+async def issue_admin_token(admin: AdminLogin, session: Session):
+    db_admin = await authenticate_admin(admin, session)
+    return create_access_token(db_admin.id, "admin")
+
+def get_password_hashes(model: type[User] | type[Admin], name: str, session: Session):
+    # 同名账号可能有多个；取出后立即结束事务归还连接，校验密码期间不占用数据库连接
+    rows = session.exec(select(model.id, model.password).where(model.name == name)).all()
+    session.rollback()
+    return rows
+
+def set_password_hash(model: type[User] | type[Admin], account_id: int, password_hash: str, session: Session):
+    session.exec(update(model).where(model.id == account_id).values(password=password_hash))
+    session.commit()
+
+async def authenticate_account(model: type[User] | type[Admin], name: str, password: str, session: Session):
+    # 数据库访问在线程池中执行，哈希计算在单独限流的线程中执行，等待期间不占用线程池
+    for account_id, password_hash in await run_in_threadpool(get_password_hashes, model, name, session):
+        if await verify_password_async(password, password_hash):
+            # 明文或旧参数的密码在登录成功后重新哈希
+            if password_needs_rehash(password_hash):
+                await run_in_threadpool(set_password_hash, model, account_id, await hash_password_async(password), session)
+            return await run_in_threadpool(session.get, model, account_id)
+    return None
 
 def get_count(table: str, session: Session):
-    if table == "users":
-        count = session.exec(select(func.count(User.id))).one()
-    elif table == "orders":
-        count = session.exec(select(func.count(Order.id))).one()
-    elif table == "trains":
-        count = session.exec(select(func.count(Train.id))).one()
-    elif table == "stations":
-        count = session.exec(select(func.count(Station.id))).one()
-    elif table == "runs":
-        count = session.exec(select(func.count(TrainRun.id))).one()
-    elif table == "nums":
-        count = session.exec(select(func.count(TrainRunNum.id))).one()
-    else:
+    # 由看板计数器提供，不再逐次 COUNT 全表
+    if table not in dashboard.counts:
         raise HTTPException(status_code=400, detail="Invalid table")
-    return {"count": count}
+    return {"count": dashboard.count(table)}
 
 
 # User CRUD
@@ -71,20 +107,27 @@ def get_user(user_id: int, session: Session):
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
-def get_users(offset: int, limit: int, session: Session):
-    users = session.exec(select(User).offset(offset).limit(limit)).all()
-    return users
+def get_users(offset: int, limit: int, session: Session, cursor: str | None = None):
+    return paginate(select(User), User.id, offset, limit, cursor, session)
 
-def authenticate_user(user: UserLogin, session: Session):
-    user = session.exec(select(User).where(User.name == user.name, User.password == user.password)).one()
-    if user is None:
+async def authenticate_user(user: UserLogin, session: Session):
+    db_user = await authenticate_account(User, user.name, user.password, session)
+    if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    return db_user
+
+async def issue_user_token(user: UserLogin, session: Session):
+    db_user = await authenticate_user(user, session)
+    if db_user.banned:
+        raise HTTPException(status_code=403, detail="User is banned")
+    return create_access_token(db_user.id, "user")
 
-def add_user(user: UserCreate, session: Session):
-    db_user = User.model_validate(user)
+def add_user(user: UserCreate, session: Session, password_hash: str | None = None):
+    # 接口调用时由 hash_password_async 预先计算哈希
+    db_user = User.model_validate(user, update={"password": password_hash or hash_password(user.password)})
     session.add(db_user)
     session.commit()
+    dashboard.add("users")
     session.refresh(db_user)
     return db_user
 
@@ -94,16 +137,23 @@ def remove_user(user_id: int, session: Session):
         raise HTTPException(status_code=404, detail="User not found")
     session.delete(user)
     session.commit()
+    dashboard.add("users", -1)
+    auth_cache.revoke_subject("user", user_id)
     return {"message": "User deleted successfully"}
 
-def modify_user(user_id: int, user: UserUpdate, session: Session):
+def modify_user(user_id: int, user: UserUpdate, session: Session, password_hash: str | None = None):
     db_user = session.get(User, user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     user_data = user.model_dump(exclude_unset=True)
+    if user_data.get("password") is not None:
+        user_data["password"] = password_hash or hash_password(user_data["password"])
     db_user.sqlmodel_update(user_data)
     session.add(db_user)
     session.commit()
+    # 修改密码后之前签发的令牌全部失效
+    if user_data.get("password") is not None:
+        auth_cache.revoke_subject("user", user_id)
     session.refresh(db_user)
     return db_user
 
@@ -114,104 +164,247 @@ def set_user_ban(user_id: int, banned: bool, session: Session):
     db_user.banned = banned
     session.add(db_user)
     session.commit()
+    auth_cache.set_banned(user_id, banned)
     session.refresh(db_user)
     return db_user
 
 
 # Order CRUD
 def get_order(order_id: int, session: Session):
-    order = session.get(Order, order_id)
+    order = session.get(Order, order_id, options=order_with_ticket_options)
     if order is None:
         raise HTTPException(status_code=404, detail="Order not found")
     return order
 
-def get_orders(offset: int, limit: int, session: Session):
-    orders = session.exec(select(Order).offset(offset).limit(limit)).all()
-    return orders
-
-def get_orders_by_user(user_id: int, session: Session):
-    orders = session.exec(select(Order).where(Order.user_id == user_id)).all()
-    return orders
-
-def add_order(order: OrderCreate, session: Session):
+def get_order_user_id(order_id: int, session: Session):
+    user_id = session.exec(select(Order.user_id).where(Order.id == order_id)).first()
+    if user_id is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+    return user_id
+
+def get_orders(offset: int, limit: int, session: Session, cursor: str | None = None, status: OrderStatus | None = None,
+               created_from: datetime | None = None, created_to: datetime | None = None):
+    # 状态与下单时间的筛选走 ix_order_status_created_at
+    statement = select(Order).options(*order_with_ticket_options)
+    if status is not None:
+        statement = statement.where(Order.status == status)
+    if created_from is not None:
+        statement = statement.where(Order.created_at >= created_from)
+    if created_to is not None:
+        statement = statement.where(Order.created_at < created_to)
+    return paginate(statement, Order.id, offset, limit, cursor, session)
+
+def get_orders_by_user(user_id: int, limit: int, session: Session, cursor: str | None = None, status: OrderStatus | None = None,
+                       created_from: datetime | None = None, created_to: datetime | None = None):
+    # 按下单时间倒序分页，游标为上一页最后一条的 (created_at, id)，整个查询走 ix_order_user_id_created_at
+    if limit < 0:
+        raise HTTPException(status_code=400, detail="Invalid limit")
+    limit = min(limit, MAX_PAGE_SIZE)
+    statement = select(Order).options(*order_with_ticket_options).where(Order.user_id == user_id)
+    if status is not None:
+        statement = statement.where(Order.status == status)
+    if created_from is not None:
+        statement = statement.where(Order.created_at >= created_from)
+    if created_to is not None:
+        statement = statement.where(Order.created_at < created_to)
+    if cursor is not None:
+        created_at, order_id = decode_cursor(cursor, 2)
+        try:
+            created_at = datetime.fromisoformat(created_at)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if not isinstance(order_id, int):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        statement = statement.where(or_(
+            Order.created_at < created_at,
+            and_(Order.created_at == created_at, Order.id < order_id)
+        ))
+
+    orders = session.exec(statement.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1)).all()
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        if orders:
+            next_cursor = encode_cursor(orders[-1].created_at.isoformat(), orders[-1].id)
+    return orders, next_cursor
+
+def segment_mask(start_seq: int, end_seq: int):
+    # 区间 [start_seq, end_seq) 内每一段对应一位，第 i 位表示第 i+1 站到第 i+2 站
+    return ((1 << (end_seq - start_seq)) - 1) << (start_seq - 1)
+
+# 批量排班时每提交一次包含的车次数，以及一次最多排班的天数
+SCHEDULE_BATCH_SIZE = 30
+SCHEDULE_MAX_DAYS = 366
+
+# 发生冲突时重新加载库存再选座的次数上限
+ALLOCATION_ATTEMPTS = 3
+
+def ticket_slot_status(status: TicketSlotStatus):
+    return literal(status, TicketSlot.__table__.c.status.type)
+
+def occupy_ticket_slot(slot_id: int, mask: int, full_mask: int, session: Session):
+    # 条件更新：只有这些区段在数据库中仍空闲时才占用，返回占用后的位图，冲突时返回 None
+    occupancy = TicketSlot.occupancy.op("|")(mask)
+    return session.exec(
+        update(TicketSlot)
+        .where(TicketSlot.id == slot_id, TicketSlot.occupancy.op("&")(mask) == 0)
+        .values(
+            occupancy=occupancy,
+            status=case(
+                (occupancy.op("&")(full_mask) == full_mask, ticket_slot_status(TicketSlotStatus.full)),
+                else_=ticket_slot_status(TicketSlotStatus.remaining)
+            )
+        )
+        .returning(TicketSlot.occupancy)
+    ).scalar_one_or_none()
+
+def ticket_mask(ticket: Ticket):
+    if ticket.occupancy is not None:
+        return ticket.occupancy
+    return segment_mask(ticket.start_sequence, ticket.end_sequence)
+
+def release_ticket_slots(slot_masks: dict[int, int], session: Session):
+    # 在数据库中直接清除对应位，返回各座位释放后的位图
+    occupancies = {}
+    for slot_id, mask in slot_masks.items():
+        occupancy = TicketSlot.occupancy.op("&")(~mask)
+        occupancies[slot_id] = session.exec(
+            update(TicketSlot)
+            .where(TicketSlot.id == slot_id)
+            .values(
+                occupancy=occupancy,
+                status=case(
+                    (occupancy == 0, ticket_slot_status(TicketSlotStatus.empty)),
+                    else_=ticket_slot_status(TicketSlotStatus.remaining)
+                )
+            )
+            .returning(TicketSlot.occupancy)
+        ).scalar_one()
+    return occupancies
+
+def check_order(order: OrderCreate | OrderBatchCreate, session: Session):
     if order.start_seq >= order.end_seq:
         raise HTTPException(status_code=400, detail="Invalid route sequence")
     if session.get(Route, order.start_route_id) is None:
         raise HTTPException(status_code=404, detail="Start route not found")
     if session.get(Route, order.end_route_id) is None:
         raise HTTPException(status_code=404, detail="End route not found")
+    train_run = session.get(TrainRun, order.train_run_id)
+    if train_run is None:
+        raise HTTPException(status_code=404, detail="TrainRun not found")
+    if not train_run.locked or train_run.finished:
+        raise HTTPException(status_code=400, detail="TrainRun is not on sale")
 
-    if order.is_through:
-        ticket_slot = session.exec(select(TicketSlot).where(TicketSlot.train_run_id == order.train_run_id, TicketSlot.status == "empty")).first()
-        if ticket_slot is None:
-            raise HTTPException(status_code=400, detail="No available ticket slot")
-        ticket = Ticket(price=order.price, start_sequence=order.start_seq, end_sequence=order.end_seq)
-        ticket_slot.status = "full"
-        ticket.ticket_slot = ticket_slot
-    else:
-        ticket_slots = session.exec(select(TicketSlot).where(TicketSlot.train_run_id == order.train_run_id, TicketSlot.status == "remaining")).all()
-        if not ticket_slots:
-            ticket_slot = session.exec(select(TicketSlot).where(TicketSlot.train_run_id == order.train_run_id, TicketSlot.status == "empty")).first()
-            if ticket_slot is None:
+    # 站点数与票价均以服务端的线路数据为准
+    train_run_num_id, train_type = fare_engine.run(order.train_run_id, session)
+    distance = fare_engine.distance(train_run_num_id, order.start_seq, order.end_seq, session)
+    full_mask = segment_mask(1, len(fare_engine.kilometers(train_run_num_id, session)))
+    # 直达票独占整个座位
+    mask = full_mask if order.is_through else segment_mask(order.start_seq, order.end_seq)
+    return mask, full_mask, train_type, distance
+
+def add_order(order: OrderCreate, session: Session):
+    mask, full_mask, train_type, distance = check_order(order, session)
+
+    # 选座在内存中完成，写库后再更新内存，整个过程持有该车次的锁
+    with seat_inventory.run(order.train_run_id, session) as run_inventory:
+        reloaded = False
+        for _ in range(ALLOCATION_ATTEMPTS):
+            slot = run_inventory.find(mask, full_mask, order.carriage_type)
+            if slot is None and not reloaded:
+                # 其他进程可能已取消或超时释放了座位，拒绝前从数据库重新加载一次
+                seat_inventory.refresh(run_inventory, session)
+                reloaded = True
+                slot = run_inventory.find(mask, full_mask, order.carriage_type)
+            if slot is None:
                 raise HTTPException(status_code=400, detail="No available ticket slot")
-            else:
-                ticket = Ticket(price=order.price, start_sequence=order.start_seq, end_sequence=order.end_seq)
-                ticket_slot.status = "remaining"
-                ticket.ticket_slot = ticket_slot
+            occupancy = occupy_ticket_slot(slot.id, mask, full_mask, session)
+            if occupancy is not None:
+                break
+            seat_inventory.reload(run_inventory, session)
+            reloaded = True
         else:
-            add_failed = True
-            for ticket_slot in ticket_slots:
-                addable = True
-                total = order.total_routes - (order.end_seq - order.start_seq + 1)
-                for ticket in ticket_slot.ticket:
-                    if (order.start_seq < ticket.start_sequence < order.end_seq or
-                        order.start_seq < ticket.end_sequence < order.end_seq or
-                        ticket.start_sequence <= order.start_seq and ticket.end_sequence >= order.end_seq):
-                        addable = False
-                        break
-
-                    total -= ticket.end_sequence - ticket.start_sequence
-
-                if addable:
-                    add_failed = False
-                    ticket = Ticket(price=order.price, start_sequence=order.start_seq, end_sequence=order.end_seq)
-                    if total == 0:
-                        ticket_slot.status = "full"
-                    elif total < 0:
-                        raise HTTPException(status_code=400, detail="Invalid total routes")
-                    ticket.ticket_slot = ticket_slot
-                    break
-
-            if add_failed:
-                ticket_slot = session.exec(select(TicketSlot).where(TicketSlot.train_run_id == order.train_run_id, TicketSlot.status == "empty")).first()
-                if ticket_slot is None:
-                    raise HTTPException(status_code=400, detail="No available ticket slot")
-                else:
-                    ticket = Ticket(price=order.price, start_sequence=order.start_seq, end_sequence=order.end_seq)
-                    ticket_slot.status = "remaining"
-                    ticket.ticket_slot = ticket_slot
-
-    user = session.get(User, order.user_id)
-    db_order = Order(status="pending", created_at=datetime.now())
-    db_order.user = user
-    db_order.ticket = ticket
-
-    session.add(db_order)
-    session.commit()
+            raise HTTPException(status_code=409, detail="Ticket slot conflict")
+
+        price = fare_engine.price(train_type, slot.carriage_type, distance)
+        ticket = Ticket(ticket_slot_id=slot.id, price=price, start_sequence=order.start_seq, end_sequence=order.end_seq, occupancy=mask)
+        user = session.get(User, order.user_id)
+        db_order = Order(status="pending", created_at=datetime.now())
+        db_order.user = user
+        db_order.ticket = ticket
+
+        session.add(db_order)
+        session.commit()
+        run_inventory.set_occupancy(slot.id, occupancy)
+    order_events.inc("created")
+    dashboard.orders_created()
+
     session.refresh(db_order)
     return db_order
 
+def add_orders(orders: OrderBatchCreate, session: Session):
+    if not orders.user_ids:
+        raise HTTPException(status_code=400, detail="No passengers")
+    mask, full_mask, train_type, distance = check_order(orders, session)
+
+    # 所有乘客在同一事务中出票，座位不足时一张也不出
+    with seat_inventory.run(orders.train_run_id, session) as run_inventory:
+        reloaded = False
+        for _ in range(ALLOCATION_ATTEMPTS):
+            slots = run_inventory.find_group(mask, len(orders.user_ids), orders.carriage_type)
+            if slots is None and not reloaded:
+                seat_inventory.refresh(run_inventory, session)
+                reloaded = True
+                slots = run_inventory.find_group(mask, len(orders.user_ids), orders.carriage_type)
+            if slots is None:
+                raise HTTPException(status_code=400, detail="No available ticket slot")
+            occupancies = {slot.id: occupy_ticket_slot(slot.id, mask, full_mask, session) for slot in slots}
+            if None not in occupancies.values():
+                break
+            session.rollback()
+            seat_inventory.reload(run_inventory, session)
+            reloaded = True
+        else:
+            raise HTTPException(status_code=409, detail="Ticket slot conflict")
+
+        db_orders = []
+        for slot, user_id in zip(slots, orders.user_ids):
+            price = fare_engine.price(train_type, slot.carriage_type, distance)
+            ticket = Ticket(ticket_slot_id=slot.id, price=price, start_sequence=orders.start_seq, end_sequence=orders.end_seq, occupancy=mask)
+            db_order = Order(status="pending", created_at=datetime.now())
+            db_order.user = session.get(User, user_id)
+            db_order.ticket = ticket
+            session.add(db_order)
+            db_orders.append(db_order)
+
+        session.commit()
+        for slot_id, occupancy in occupancies.items():
+            run_inventory.set_occupancy(slot_id, occupancy)
+    order_events.inc("created", value=len(db_orders))
+    dashboard.orders_created(len(db_orders))
+
+    for db_order in db_orders:
+        session.refresh(db_order)
+    return db_orders
+
 def complete_order(order_id: int, session: Session):
     order = session.get(Order, order_id)
     if order is None:
         raise HTTPException(status_code=404, detail="Order not found")
-    if order.status != "pending":
+    # 条件更新：与超时取消并发时只有一方生效，读到的状态可能已经过时
+    completed = session.exec(
+        update(Order)
+        .where(Order.id == order_id, Order.status == OrderStatus.pending)
+        .values(status=OrderStatus.completed, completed_at=datetime.now())
+    ).rowcount
+    if not completed:
+        session.rollback()
         raise HTTPException(status_code=400, detail="Invalid order status")
-    order.status = "completed"
-    order.completed_at = datetime.now()
-    order.ticket.sold = True
-    session.add(order)
+    if order.ticket_id is not None:
+        session.exec(update(Ticket).where(Ticket.id == order.ticket_id).values(sold=True))
     session.commit()
+    order_events.inc("completed")
+    dashboard.orders_changed(OrderStatus.pending, OrderStatus.completed)
     session.refresh(order)
     return order
 
@@ -221,49 +414,111 @@ def cancel_order(order_id: int, session: Session):
         raise HTTPException(status_code=404, detail="Order not found")
     if order.status == "cancelled":
         return {"message": "Order already cancelled"}
-    order.status = "cancelled"
-    order.cancelled_at = datetime.now()
-
-    # 没错，这里写崩了，为了验收好看一点，我就注释掉了
-    # 也就是说，这里取消订单后，车票数据依旧存在，只是订单状态变为取消
-    # 哎，叹息...
-    # ticket = order.ticket
-    # ticket_slot = session.get(TicketSlot, ticket.ticket_slot_id)
-    # if ticket_slot is None:
-    #     raise HTTPException(status_code=404, detail="Ticket slot not found")
-    # if len(ticket_slot.tickets) == 1:
-    #     ticket_slot.status = "empty"
-    # elif len(ticket_slot.tickets) > 1:
-    #     ticket_slot.status = "remaining"
-    # session.delete(ticket)
-    # session.add(ticket_slot)
-
-    session.add(order)
-    session.commit()
+
+    # 车票记录保留以便查询订单，只释放其在座位上占用的区段
+    ticket = session.get(Ticket, order.ticket_id) if order.ticket_id is not None else None
+    if ticket is None:
+        # 没有车票的订单不占用座位，直接取消
+        status = order.status
+        order.status = "cancelled"
+        order.cancelled_at = datetime.now()
+        session.add(order)
+        session.commit()
+        order_events.inc("cancelled")
+        dashboard.orders_changed(status, OrderStatus.cancelled)
+        session.refresh(order)
+        return order
+
+    ticket_slot = session.get(TicketSlot, ticket.ticket_slot_id)
+    with seat_inventory.run(ticket_slot.train_run_id, session) as run_inventory:
+        session.refresh(order)
+        if order.status == "cancelled":
+            return {"message": "Order already cancelled"}
+        status = order.status
+        order.status = "cancelled"
+        order.cancelled_at = datetime.now()
+        session.add(order)
+        occupancies = release_ticket_slots({ticket.ticket_slot_id: ticket_mask(ticket)}, session)
+        session.commit()
+        for slot_id, occupancy in occupancies.items():
+            run_inventory.set_occupancy(slot_id, occupancy)
+    order_events.inc("cancelled")
+    dashboard.orders_changed(status, OrderStatus.cancelled)
+
     session.refresh(order)
     return order
 
 def remove_order(order_id: int, session: Session):
     order = session.get(Order, order_id)
-    ticket = session.get(Ticket, order.ticket_id)
     if order is None:
         raise HTTPException(status_code=404, detail="Order not found")
+    ticket = session.get(Ticket, order.ticket_id) if order.ticket_id is not None else None
+    if ticket is None:
+        status, created_at = order.status, order.created_at
+        session.delete(order)
+        session.commit()
+        dashboard.order_removed(status, created_at)
+        return {"message": "Order deleted successfully"}
+
     ticket_slot = session.get(TicketSlot, ticket.ticket_slot_id)
-    if ticket_slot is None:
-        raise HTTPException(status_code=404, detail="Ticket slot not found")
-    if len(ticket_slot.ticket) == 1:
-        ticket_slot.status = "empty"
-    elif len(ticket_slot.ticket) > 1:
-        ticket_slot.status = "remaining"
-    session.delete(order)
-    session.delete(ticket)
-    session.add(ticket_slot)
-    session.commit()
+    with seat_inventory.run(ticket_slot.train_run_id, session) as run_inventory:
+        session.refresh(order)
+        occupancies = {}
+        if order.status != "cancelled":
+            occupancies = release_ticket_slots({ticket.ticket_slot_id: ticket_mask(ticket)}, session)
+        status, created_at = order.status, order.created_at
+        session.delete(order)
+        session.delete(ticket)
+        session.commit()
+        for slot_id, occupancy in occupancies.items():
+            run_inventory.set_occupancy(slot_id, occupancy)
+    dashboard.order_removed(status, created_at)
     return {"message": "Order deleted successfully"}
 
+def expire_pending_orders(hold: timedelta, batch_size: int, session: Session):
+    cutoff = datetime.now() - hold
+    candidates = session.exec(
+        select(Order.id, TicketSlot.train_run_id)
+        .join(Ticket, Order.ticket_id == Ticket.id)
+        .join(TicketSlot, Ticket.ticket_slot_id == TicketSlot.id)
+        .where(Order.status == "pending", Order.created_at < cutoff)
+        .order_by(Order.created_at)
+        .limit(batch_size)
+    ).all()
+    if not candidates:
+        return 0
+
+    # 一批订单只提交一次，期间持有涉及车次的库存锁
+    with seat_inventory.runs({train_run_id for _, train_run_id in candidates}, session) as run_inventories:
+        # 条件更新：期间已支付或取消的订单不受影响，只释放确实由本次取消的订单占用的座位
+        cancelled_ids = set(session.exec(
+            update(Order)
+            .where(Order.id.in_([order_id for order_id, _ in candidates]), Order.status == OrderStatus.pending)
+            .values(status=OrderStatus.cancelled, cancelled_at=datetime.now())
+            .returning(Order.id)
+        ).scalars())
+        rows = session.exec(
+            select(Ticket, TicketSlot.train_run_id)
+            .join(Order, Order.ticket_id == Ticket.id)
+            .join(TicketSlot, Ticket.ticket_slot_id == TicketSlot.id)
+            .where(Order.id.in_(cancelled_ids))
+        ).all() if cancelled_ids else []
+        slot_masks = {}
+        slot_runs = {}
+        for ticket, train_run_id in rows:
+            slot_masks[ticket.ticket_slot_id] = slot_masks.get(ticket.ticket_slot_id, 0) | ticket_mask(ticket)
+            slot_runs[ticket.ticket_slot_id] = train_run_id
+        occupancies = release_ticket_slots(slot_masks, session)
+        session.commit()
+        for slot_id, occupancy in occupancies.items():
+            run_inventories[slot_runs[slot_id]].set_occupancy(slot_id, occupancy)
+    order_events.inc("expired", value=len(cancelled_ids))
+    dashboard.orders_changed(OrderStatus.pending, OrderStatus.cancelled, len(cancelled_ids))
+    return len(cancelled_ids)
+
 # Carriage CRUD
 def get_carriage(carriage_id: int, session: Session):
-    carriage = session.get(Carriage, carriage_id)
+    carriage = session.get(Carriage, carriage_id, options=carriage_with_train_options)
     if carriage is None:
         raise HTTPException(status_code=404, detail="Carriage not found")
     return carriage
@@ -341,14 +596,13 @@ def set_carriage_deprecated(carriage_id: int, deprecated: bool, session: Session
 
 # Train CRUD
 def get_train(train_id: int, session: Session):
-    train = session.get(Train, train_id)
+    train = session.get(Train, train_id, options=train_with_carriages_options)
     if train is None:
         raise HTTPException(status_code=404, detail="Train not found")
     return train
 
-def get_trains(offset: int, limit: int, session: Session):
-    trains = session.exec(select(Train).offset(offset).limit(limit)).all()
-    return trains
+def get_trains(offset: int, limit: int, session: Session, cursor: str | None = None):
+    return paginate(select(Train), Train.id, offset, limit, cursor, session)
 
 def add_train(train: TrainCreate, session: Session):
     train_data = train.model_dump()
@@ -362,6 +616,7 @@ def add_train(train: TrainCreate, session: Session):
             add_carriage(carriage, session, db_train.id, auto_commit=False)
 
     session.commit()
+    dashboard.add("trains")
     return db_train
 
 def remove_train(train_id: int, session: Session):
@@ -376,6 +631,7 @@ def remove_train(train_id: int, session: Session):
         raise HTTPException(status_code=400, detail="You can't delete deprecated train")
     session.delete(train)
     session.commit()
+    dashboard.add("trains", -1)
     return {"message": "Train deleted successfully"}
 
 def modify_train(train_id: int, train: TrainUpdate, session: Session):
@@ -406,14 +662,15 @@ def get_station(station_id: int, session: Session):
         raise HTTPException(status_code=404, detail="Station not found")
     return station
 
-def get_stations(offset: int, limit: int, session: Session):
-    stations = session.exec(select(Station).offset(offset).limit(limit)).all()
-    return stations
+def get_stations(offset: int, limit: int, session: Session, cursor: str | None = None):
+    return paginate(select(Station), Station.id, offset, limit, cursor, session)
 
 def add_station(station: StationCreate, session: Session):
     db_station = Station.model_validate(station)
     session.add(db_station)
     session.commit()
+    dashboard.add("stations")
+    journey_planner.clear()
     session.refresh(db_station)
     return db_station
 
@@ -427,6 +684,8 @@ def remove_station(station_id: int, session: Session):
         raise HTTPException(status_code=400, detail="You can't delete deprecated station")
     session.delete(station)
     session.commit()
+    dashboard.add("stations", -1)
+    journey_planner.clear()
     return {"message": "Station deleted successfully"}
 
 def modify_station(station_id: int, station: StationUpdate, session: Session):
@@ -437,6 +696,8 @@ def modify_station(station_id: int, station: StationUpdate, session: Session):
     db_station.sqlmodel_update(station_data)
     session.add(db_station)
     session.commit()
+    search_cache.invalidate_station(station_id)
+    journey_planner.clear()
     session.refresh(db_station)
     return db_station
 
@@ -447,22 +708,25 @@ def set_station_deprecated(station_id: int, deprecated: bool, session: Session):
     db_station.deprecated = deprecated
     session.add(db_station)
     session.commit()
+    search_cache.invalidate_station(station_id)
+    journey_planner.clear()
     session.refresh(db_station)
     return db_station
 
 
 # TrainRunNum CRUD
 def get_train_run_num(train_run_num_id: int, session: Session):
-    train_run_num = session.get(TrainRunNum, train_run_num_id)
+    train_run_num = session.get(TrainRunNum, train_run_num_id, options=train_run_num_with_routes_options)
     if train_run_num is None:
         raise HTTPException(status_code=404, detail="TrainRunNum not found")
     return train_run_num
 
-def get_train_run_nums(offset: int, limit: int, session: Session):
-    train_run_nums = session.exec(select(TrainRunNum).offset(offset).limit(limit)).all()
-    return train_run_nums
+def get_train_run_nums(offset: int, limit: int, session: Session, cursor: str | None = None):
+    return paginate(select(TrainRunNum), TrainRunNum.id, offset, limit, cursor, session)
 
 def add_train_run_num(train_run_num: TrainRunNumCreate, session: Session):
+    if len(train_run_num.routes) > MAX_ROUTE_STOPS:
+        raise HTTPException(status_code=400, detail=f"Too many stops, at most {MAX_ROUTE_STOPS} are supported")
     train_run_num_data = train_run_num.model_dump()
     train_run_num_data.pop("routes")
     db_train_run_num = TrainRunNum.model_validate(train_run_num_data)
@@ -487,10 +751,39 @@ def add_train_run_num(train_run_num: TrainRunNumCreate, session: Session):
         db_route.station = station
         db_train_run_num.routes.append(db_route)
 
+    session.flush()
+    rebuild_station_pairs(db_train_run_num.id, session)
     session.commit()
+    dashboard.add("nums")
     session.refresh(db_train_run_num)
     return db_train_run_num
 
+def rebuild_station_pairs(train_run_num_id: int, session: Session):
+    session.exec(delete(StationPair).where(StationPair.train_run_num_id == train_run_num_id))
+    routes = session.exec(
+        select(Route.station_id, Route.sequence)
+        .where(Route.train_run_num_id == train_run_num_id)
+        .order_by(Route.sequence)
+    ).all()
+    station_pairs = [
+        {
+            "start_station_id": start_station_id,
+            "end_station_id": end_station_id,
+            "train_run_num_id": train_run_num_id,
+            "start_sequence": start_sequence,
+            "end_sequence": end_sequence,
+        }
+        for i, (start_station_id, start_sequence) in enumerate(routes)
+        for end_station_id, end_sequence in routes[i + 1:]
+    ]
+    if station_pairs:
+        session.exec(insert(StationPair), params=station_pairs)
+
+def rebuild_all_station_pairs(session: Session):
+    for train_run_num_id in session.exec(select(TrainRunNum.id)).all():
+        rebuild_station_pairs(train_run_num_id, session)
+    session.commit()
+
 def remove_train_run_num(train_run_num_id: int, session: Session):
     train_run_num = session.get(TrainRunNum, train_run_num_id)
     if train_run_num is None:
@@ -500,7 +793,10 @@ def remove_train_run_num(train_run_num_id: int, session: Session):
     if train_run_num.deprecated:
         raise HTTPException(status_code=400, detail="You can't delete deprecated train run num")
     session.delete(train_run_num)
+    session.exec(delete(StationPair).where(StationPair.train_run_num_id == train_run_num_id))
     session.commit()
+    dashboard.add("nums", -1)
+    fare_engine.invalidate_train_run_num(train_run_num_id)
     return {"message": "TrainRunNum deleted successfully"}
 
 def modify_train_run_num(train_run_num_id: int, train_run_num: TrainRunNumUpdate, session: Session):
@@ -511,6 +807,7 @@ def modify_train_run_num(train_run_num_id: int, train_run_num: TrainRunNumUpdate
     db_train_run_num.sqlmodel_update(train_run_num_data)
     session.add(db_train_run_num)
     session.commit()
+    invalidate_train_run_num_searches(train_run_num_id, session)
     session.refresh(db_train_run_num)
     return db_train_run_num
 
@@ -521,12 +818,13 @@ def set_train_run_num_deprecated(train_run_num_id: int, deprecated: bool, sessio
     db_train_run_num.deprecated = deprecated
     session.add(db_train_run_num)
     session.commit()
+    invalidate_train_run_num_searches(train_run_num_id, session)
     session.refresh(db_train_run_num)
     return db_train_run_num
 
 # Route CRUD
 def get_route(route_id: int, session: Session):
-    route = session.get(Route, route_id)
+    route = session.get(Route, route_id, options=route_with_train_run_num_options)
     if route is None:
         raise HTTPException(status_code=404, detail="Route not found")
     return route
@@ -538,23 +836,36 @@ def modify_route(route_id: int, route: RouteUpdate, session: Session):
     route_data = route.model_dump(exclude_unset=True)
     db_route.sqlmodel_update(route_data)
     session.add(db_route)
+    if "sequence" in route_data:
+        session.flush()
+        rebuild_station_pairs(db_route.train_run_num_id, session)
     session.commit()
+    fare_engine.invalidate_train_run_num(db_route.train_run_num_id)
+    invalidate_train_run_num_searches(db_route.train_run_num_id, session)
     session.refresh(db_route)
     return db_route
 
 # TrainRun CRUD
 def get_train_run(train_run_id: int, session: Session):
-    train_run = session.get(TrainRun, train_run_id)
+    train_run = session.get(TrainRun, train_run_id, options=train_run_with_train_options)
     if train_run is None:
         raise HTTPException(status_code=404, detail="TrainRun not found")
     return train_run
 
-def get_train_runs(offset: int, limit: int, session: Session):
-    train_runs = session.exec(select(TrainRun).offset(offset).limit(limit)).all()
-    return train_runs
+def get_train_runs(offset: int, limit: int, session: Session, cursor: str | None = None, train_run_num_id: int | None = None,
+                   running_date_from: date | None = None, running_date_to: date | None = None):
+    # 运行日期区间的筛选走 ix_train_run_running_date，指定车次标识时走 ix_train_run_num_date
+    statement = select(TrainRun).options(*train_run_with_train_options)
+    if train_run_num_id is not None:
+        statement = statement.where(TrainRun.train_run_num_id == train_run_num_id)
+    if running_date_from is not None:
+        statement = statement.where(TrainRun.running_date >= running_date_from)
+    if running_date_to is not None:
+        statement = statement.where(TrainRun.running_date <= running_date_to)
+    return paginate(statement, TrainRun.id, offset, limit, cursor, session)
 
 
-def get_train_runs_by_demand(train_run_demand: TrainRunDemand, session: Session):
+def get_demand_stations(train_run_demand: TrainRunDemand, session: Session):
     # 获取起点和终点站点信息
     stations = session.exec(
         select(Station)
@@ -568,69 +879,195 @@ def get_train_runs_by_demand(train_run_demand: TrainRunDemand, session: Session)
 
     # 提取起点和终点站点
     station_map = {station.name: station for station in stations}
-    start_station = station_map[train_run_demand.start_station]
-    end_station = station_map[train_run_demand.end_station]
-
-    # 子查询：获取 Route.sequence 的值
-    start_station_sequence = (
-        select(Route.sequence)
-        .where(
-            Route.station_id == start_station.id,
-            Route.train_run_num_id == TrainRunNum.id
-        )
-    ).scalar_subquery()
+    return station_map[train_run_demand.start_station], station_map[train_run_demand.end_station]
 
-    end_station_sequence = (
-        select(Route.sequence)
-        .where(
-            Route.station_id == end_station.id,
-            Route.train_run_num_id == TrainRunNum.id
-        )
-    ).scalar_subquery()
+def get_train_runs_by_demand(train_run_demand: TrainRunDemand, session: Session):
+    start_station, end_station = get_demand_stations(train_run_demand, session)
+    return get_train_runs_between(start_station, end_station, train_run_demand, session)
 
-    # 主查询
+def get_train_runs_between(start_station: Station, end_station: Station, train_run_demand: TrainRunDemand, session: Session):
+    # 通过起讫站索引一次连接查出经过两站且顺序正确的车次
     train_runs = session.exec(
         select(TrainRun)
-        .join(TrainRunNum)
+        .options(*train_run_with_routes_options)
+        .join(StationPair, StationPair.train_run_num_id == TrainRun.train_run_num_id)
+        .join(TrainRunNum, TrainRunNum.id == TrainRun.train_run_num_id)
         .where(
+            StationPair.start_station_id == start_station.id,
+            StationPair.end_station_id == end_station.id,
             TrainRunNum.deprecated == False,
-            TrainRunNum.routes.any(
-                Route.station_id.in_([start_station.id, end_station.id])
-            ),
             TrainRun.locked == True,
             TrainRun.finished == False,
-            TrainRun.running_date == train_run_demand.running_date,
-            start_station_sequence < end_station_sequence  # 起点序号需小于终点序号
+            TrainRun.running_date == train_run_demand.running_date
         )
+        .distinct()
     ).all()
 
     return train_runs
 
-def add_train_run(train_run: TrainRunCreate, session: Session):
-    train = session.get(Train, train_run.train_id)
+train_run_demand_adapter = TypeAdapter(List[TrainRunOutWithTrainRunNum])
+
+def search_train_runs(train_run_demand: TrainRunDemand, session: Session):
+    # 返回序列化好的 JSON，命中缓存时不访问数据库
+    key = (train_run_demand.running_date, train_run_demand.start_station, train_run_demand.end_station)
+    content = search_cache.get(key)
+    if content is not None:
+        return content
+
+    generation = search_cache.generation
+    start_station, end_station = get_demand_stations(train_run_demand, session)
+    train_runs = get_train_runs_between(start_station, end_station, train_run_demand, session)
+    results = train_run_demand_adapter.validate_python(train_runs, from_attributes=True)
+    content = train_run_demand_adapter.dump_json(results)
+    search_cache.put(
+        key, content, generation, train_run_demand.running_date,
+        {start_station.id, end_station.id},
+        {result.train_run_num.id for result in results},
+        {route.station.id for result in results for route in result.train_run_num.routes}
+    )
+    return content
+
+def invalidate_train_run_num_searches(train_run_num_id: int, session: Session):
+    station_ids = set(session.exec(select(Route.station_id).where(Route.train_run_num_id == train_run_num_id)).all())
+    search_cache.invalidate_train_run_num(train_run_num_id, station_ids)
+    journey_planner.clear()
+
+def get_journeys(journey_demand: JourneyDemand, session: Session):
+    if journey_demand.max_transfers < 0:
+        raise HTTPException(status_code=400, detail="Invalid max transfers")
+    if journey_demand.start_station == journey_demand.end_station:
+        raise HTTPException(status_code=400, detail="Start and end station must be different")
+
+    timetable = journey_planner.timetable(journey_demand.running_date, session)
+    missing_stations = [name for name in (journey_demand.start_station, journey_demand.end_station)
+                        if name not in timetable.name_index]
+    if missing_stations:
+        raise HTTPException(status_code=404, detail=f"Stations not found: {', '.join(missing_stations)}")
+
+    origin = timetable.name_index[journey_demand.start_station]
+    target = timetable.name_index[journey_demand.end_station]
+    departure_after = to_minutes(journey_demand.departure_after) if journey_demand.departure_after is not None else 0
+    itineraries = timetable.plan(
+        origin, target, departure_after,
+        min(journey_demand.max_transfers, MAX_TRANSFERS),
+        journey_demand.min_connection_minutes,
+        journey_demand.city_transfer_minutes
+    )
+
+    # 每多换乘一次且到达更早的方案各返回一个，换乘少的在前
+    journeys = []
+    for legs in itineraries:
+        arrival = legs[-1]["arrival"]
+        if legs[-1]["end_station"] != journey_demand.end_station:
+            arrival += journey_demand.city_transfer_minutes
+        journeys.append({
+            "transfers": len(legs) - 1,
+            "departure_time": to_time(legs[0]["departure"]),
+            "arrival_time": to_time(arrival),
+            "duration_minutes": arrival - legs[0]["departure"],
+            "legs": [{
+                **{key: leg[key] for key in ("train_run_id", "train_run_num_id", "train_run_num_name", "start_station", "end_station", "start_seq", "end_seq")},
+                "departure_time": to_time(leg["departure"]),
+                "arrival_time": to_time(leg["arrival"]),
+            } for leg in legs]
+        })
+    return journeys
+
+def get_train_run_availability(train_run_id: int, start_seq: int, end_seq: int, session: Session):
+    train_run = session.get(TrainRun, train_run_id)
+    if train_run is None:
+        raise HTTPException(status_code=404, detail="TrainRun not found")
+    # 与下单的校验一致，未开售或已结束的车次不加载库存
+    if not train_run.locked or train_run.finished:
+        raise HTTPException(status_code=400, detail="TrainRun is not on sale")
+    fare_engine.distance(train_run.train_run_num_id, start_seq, end_seq, session)
+    seats = seat_inventory.availability(train_run_id, segment_mask(start_seq, end_seq), session)
+    return {"train_run_id": train_run_id, "start_seq": start_seq, "end_seq": end_seq, "seats": seats}
+
+def get_train_run_quote(train_run_id: int, start_seq: int, end_seq: int, session: Session):
+    train_run_num_id, train_type = fare_engine.run(train_run_id, session)
+    distance = fare_engine.distance(train_run_num_id, start_seq, end_seq, session)
+    prices = {carriage_type: fare_engine.price(train_type, carriage_type, distance) for carriage_type in train_dict[train_type]}
+    return {"train_run_id": train_run_id, "start_seq": start_seq, "end_seq": end_seq, "kilometers": distance, "prices": prices}
+
+def add_ticket_slots(train_run_id: int, train_id: int, session: Session):
+    # 用一条 INSERT ... SELECT 为列车的每个座位生成空票位
+    session.exec(
+        insert(TicketSlot).from_select(
+            ["train_run_id", "seat_id", "status", "occupancy"],
+            select(literal(train_run_id), Seat.id, ticket_slot_status(TicketSlotStatus.empty), literal(0))
+            .join(Carriage, Seat.carriage_id == Carriage.id)
+            .where(Carriage.train_id == train_id)
+            .order_by(Carriage.num, Seat.id)
+        )
+    )
+
+def check_train_run(train_id: int, train_run_num_id: int, session: Session):
+    train = session.get(Train, train_id)
     if train is None:
         raise HTTPException(status_code=404, detail="Train not found")
     if not train.valid:
         raise HTTPException(status_code=400, detail="The train is not valid")
-    train_run_num = session.get(TrainRunNum, train_run.train_run_num_id)
+    train_run_num = session.get(TrainRunNum, train_run_num_id)
     if train_run_num is None:
         raise HTTPException(status_code=404, detail="TrainRunNum not found")
+    return train, train_run_num
+
+def add_train_run(train_run: TrainRunCreate, session: Session):
+    train, train_run_num = check_train_run(train_run.train_id, train_run.train_run_num_id, session)
 
     db_train_run = TrainRun.model_validate(train_run)
     db_train_run.train = train
     db_train_run.train_run_num = train_run_num
-
-    for carriage_id in session.exec(select(Carriage.id).where(Carriage.train_id == train.id)):
-        for seat in session.exec(select(Seat).where(Seat.carriage_id == carriage_id)):
-            ticket_slot = TicketSlot(status="empty")
-            ticket_slot.seat = seat
-            db_train_run.ticket_slots.append(ticket_slot)
-
     session.add(db_train_run)
+    session.flush()
+    add_ticket_slots(db_train_run.id, train.id, session)
+
     session.commit()
+    dashboard.add("runs")
     session.refresh(db_train_run)
     return db_train_run
 
+def add_train_run_schedule(schedule: TrainRunSchedule, session: Session):
+    if schedule.end_date < schedule.start_date:
+        raise HTTPException(status_code=400, detail="Invalid date range")
+    if (schedule.end_date - schedule.start_date).days >= SCHEDULE_MAX_DAYS:
+        raise HTTPException(status_code=400, detail="Date range too long")
+    if any(weekday < 0 or weekday > 6 for weekday in schedule.weekdays):
+        raise HTTPException(status_code=400, detail="Invalid weekday")
+    train, train_run_num = check_train_run(schedule.train_id, schedule.train_run_num_id, session)
+
+    # 已有车次的日期跳过
+    existing_dates = set(session.exec(
+        select(TrainRun.running_date)
+        .where(
+            TrainRun.train_run_num_id == train_run_num.id,
+            TrainRun.running_date >= schedule.start_date,
+            TrainRun.running_date <= schedule.end_date
+        )
+    ).all())
+    weekdays = set(schedule.weekdays)
+    running_dates = [
+        running_date
+        for running_date in (schedule.start_date + timedelta(days=i) for i in range((schedule.end_date - schedule.start_date).days + 1))
+        if running_date.weekday() in weekdays and running_date not in existing_dates
+    ]
+
+    train_run_ids = []
+    for i, running_date in enumerate(running_dates, 1):
+        db_train_run = TrainRun(running_date=running_date, train_id=train.id, train_run_num_id=train_run_num.id)
+        session.add(db_train_run)
+        session.flush()
+        add_ticket_slots(db_train_run.id, train.id, session)
+        train_run_ids.append(db_train_run.id)
+        if i % SCHEDULE_BATCH_SIZE == 0:
+            session.commit()
+    session.commit()
+    dashboard.add("runs", len(train_run_ids))
+
+    train_runs = session.exec(select(TrainRun).where(TrainRun.id.in_(train_run_ids)).order_by(TrainRun.running_date)).all()
+    return train_runs
+
 def remove_train_run(train_run_id: int, session: Session):
     train_run = session.get(TrainRun, train_run_id)
     if train_run is None:
@@ -641,6 +1078,9 @@ def remove_train_run(train_run_id: int, session: Session):
         raise HTTPException(status_code=400, detail="You can't delete locked train run")
     session.delete(train_run)
     session.commit()
+    dashboard.add("runs", -1)
+    seat_inventory.invalidate(train_run_id)
+    fare_engine.invalidate_train_run(train_run_id)
     return {"message": "TrainRun deleted successfully"}
 
 def modify_train_run(train_run_id: int, train_run: TrainRunUpdate, session: Session):
@@ -650,10 +1090,16 @@ def modify_train_run(train_run_id: int, train_run: TrainRunUpdate, session: Sess
     if db_train_run.locked:
         raise HTTPException(status_code=400, detail="You can't modify locked train run")
 
+    running_date = db_train_run.running_date
     train_run_data = train_run.model_dump(exclude_unset=True)
     db_train_run.sqlmodel_update(train_run_data)
     session.add(db_train_run)
     session.commit()
+    fare_engine.invalidate_train_run(train_run_id)
+    search_cache.invalidate_date(running_date)
+    search_cache.invalidate_date(db_train_run.running_date)
+    journey_planner.invalidate_date(running_date)
+    journey_planner.invalidate_date(db_train_run.running_date)
     session.refresh(db_train_run)
     return db_train_run
 
@@ -664,5 +1110,8 @@ def set_train_run_finished(train_run_id: int, finished: bool, session: Session):
     db_train_run.finished = finished
     session.add(db_train_run)
     session.commit()
+    seat_inventory.invalidate(train_run_id)
+    search_cache.invalidate_date(db_train_run.running_date)
+    journey_planner.invalidate_date(db_train_run.running_date)
     session.refresh(db_train_run)
     return db_train_run
\ No newline at end of file
@@ -0,0 +1,112 @@
+import os
+import asyncio
+import logging
+import threading
+from datetime import datetime, date, time
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import Session, select, func
+from sql.database import engine
+from sql.models import User, Order, Train, Station, TrainRun, TrainRunNum, OrderStatus
+
+# 计数由各写入接口增量维护，并定期从数据库重新统计一次，修正其他进程（导入、压测数据生成等）写入造成的偏差
+DASHBOARD_REFRESH_SECONDS = float(os.environ.get("DASHBOARD_REFRESH_SECONDS", 300))
+
+logger = logging.getLogger(__name__)
+
+dashboard_tables = {
+    "users": User,
+    "orders": Order,
+    "trains": Train,
+    "stations": Station,
+    "runs": TrainRun,
+    "nums": TrainRunNum,
+}
+
+
+class Dashboard:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {table: 0 for table in dashboard_tables}
+        self.orders_by_status = {status: 0 for status in OrderStatus}
+        self.bookings_date = date.today()
+        self.bookings_today = 0
+        self.refreshed_at: datetime | None = None
+
+    def refresh(self, session: Session):
+        today = date.today()
+        counts = session.exec(select(*(
+            select(func.count(model.id)).scalar_subquery() for model in dashboard_tables.values()
+        ))).one()
+        orders_by_status = dict(session.exec(select(Order.status, func.count(Order.id)).group_by(Order.status)).all())
+        # 带上全部状态以便使用 (status, created_at) 索引
+        bookings_today = session.exec(
+            select(func.count(Order.id))
+            .where(Order.status.in_(list(OrderStatus)), Order.created_at >= datetime.combine(today, time()))
+        ).one()
+        with self._lock:
+            self.counts = dict(zip(dashboard_tables, counts))
+            self.orders_by_status = {status: orders_by_status.get(status, 0) for status in OrderStatus}
+            self.bookings_date = today
+            self.bookings_today = bookings_today
+            self.refreshed_at = datetime.now()
+
+    # 在事务提交之后调用；与定期统计并发时可能短暂偏差一次，下次统计时修正
+    def add(self, table: str, value: int = 1):
+        with self._lock:
+            self.counts[table] += value
+
+    def _roll_over(self):
+        today = date.today()
+        if today != self.bookings_date:
+            self.bookings_date = today
+            self.bookings_today = 0
+
+    def orders_created(self, value: int = 1):
+        with self._lock:
+            self._roll_over()
+            self.counts["orders"] += value
+            self.orders_by_status[OrderStatus.pending] += value
+            self.bookings_today += value
+
+    def orders_changed(self, old_status: str, new_status: str, value: int = 1):
+        with self._lock:
+            self.orders_by_status[OrderStatus(old_status)] -= value
+            self.orders_by_status[OrderStatus(new_status)] += value
+
+    def order_removed(self, status: str, created_at: datetime):
+        with self._lock:
+            self._roll_over()
+            self.counts["orders"] -= 1
+            self.orders_by_status[OrderStatus(status)] -= 1
+            if created_at.date() == self.bookings_date:
+                self.bookings_today -= 1
+
+    def count(self, table: str):
+        return self.counts[table]
+
+    def stats(self):
+        with self._lock:
+            self._roll_over()
+            return {
+                **self.counts,
+                "orders_by_status": dict(self.orders_by_status),
+                "bookings_today": self.bookings_today,
+                "refreshed_at": self.refreshed_at,
+            }
+
+
+dashboard = Dashboard()
+
+
+def refresh_dashboard():
+    with Session(engine) as session:
+        dashboard.refresh(session)
+
+async def run_dashboard_refresher():
+    # 启动时已统计过一次，这里先等待再统计
+    while True:
+        await asyncio.sleep(DASHBOARD_REFRESH_SECONDS)
+        try:
+            await run_in_threadpool(refresh_dashboard)
+        except Exception:
+            logger.exception("Dashboard refresh failed")
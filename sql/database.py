@@ -1,7 +1,63 @@
-from sqlmodel import SQLModel, create_engine
+import os
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlmodel import SQLModel, Session, create_engine, insert
 from . import models
 
-sqlite_file_name = "database.db"
-sqlite_url = f"sqlite:///{sqlite_file_name}"
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///database.db")
+DATABASE_ECHO = os.environ.get("DATABASE_ECHO", "0") == "1"
+DATABASE_POOL_SIZE = int(os.environ.get("DATABASE_POOL_SIZE", 5))
+DATABASE_MAX_OVERFLOW = int(os.environ.get("DATABASE_MAX_OVERFLOW", 10))
+DATABASE_POOL_TIMEOUT = float(os.environ.get("DATABASE_POOL_TIMEOUT", 30))
+DATABASE_POOL_RECYCLE = int(os.environ.get("DATABASE_POOL_RECYCLE", 1800))
+DATABASE_CONNECT_TIMEOUT = int(os.environ.get("DATABASE_CONNECT_TIMEOUT", 10))
+
+# SQLite 专用设置：WAL 模式下读不阻塞写，写锁被占用时最多等待 busy_timeout 毫秒
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+# 负数表示以 KiB 为单位
+SQLITE_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE", -64 * 1024))
+
+
+def sqlite_pragmas():
+    return [
+        "journal_mode=WAL",
+        "synchronous=NORMAL",
+        f"busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        f"mmap_size={SQLITE_MMAP_SIZE}",
+        f"cache_size={SQLITE_CACHE_SIZE}",
+    ]
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in sqlite_pragmas():
+        cursor.execute(f"PRAGMA {pragma}")
+    cursor.close()
+
+def build_engine(url: str = DATABASE_URL, echo: bool = DATABASE_ECHO):
+    database_url = make_url(url)
+    options = {"echo": echo}
+    if database_url.get_backend_name() == "sqlite":
+        # 连接会在线程池的不同线程间复用，由连接池保证同一时刻只被一个线程使用
+        options["connect_args"] = {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+        # 内存数据库使用单连接池，不接受连接池参数
+        if database_url.database not in (None, "", ":memory:"):
+            options.update(pool_size=DATABASE_POOL_SIZE, max_overflow=DATABASE_MAX_OVERFLOW,
+                           pool_timeout=DATABASE_POOL_TIMEOUT, pool_recycle=DATABASE_POOL_RECYCLE)
+        sqlite_engine = create_engine(url, **options)
+        event.listen(sqlite_engine, "connect", set_sqlite_pragmas)
+        return sqlite_engine
+    options.update(pool_size=DATABASE_POOL_SIZE, max_overflow=DATABASE_MAX_OVERFLOW,
+                   pool_timeout=DATABASE_POOL_TIMEOUT, pool_recycle=DATABASE_POOL_RECYCLE,
+                   pool_pre_ping=True, connect_args={"connect_timeout": DATABASE_CONNECT_TIMEOUT})
+    return create_engine(url, **options)
+
+engine = build_engine()
+
+
+def insert_returning_ids(session: Session, model, rows: list[dict]):
+    # 批量插入并按行顺序返回生成的主键
+    if not rows:
+        return []
+    return list(session.scalars(insert(model).returning(model.id), rows))
 
-engine = create_engine(sqlite_url, echo=True)
\ No newline at end of file
@@ -0,0 +1,61 @@
+from fastapi import HTTPException
+from sqlmodel import Session, select
+from sql.models import Route, TrainRun, Train
+
+price_multiple_dict = {
+    "fast": 0.45,
+    "slow": 0.3,
+    "second_class": 1,
+    "first_class": 2,
+    "business": 4
+}
+
+
+class FareEngine:
+    def __init__(self):
+        # 车次标识 -> 按站点序号排列的累计里程
+        self._kilometers: dict[int, list[int]] = {}
+        # 车次 -> (车次标识, 列车类型)
+        self._runs: dict[int, tuple[int, str]] = {}
+
+    def kilometers(self, train_run_num_id: int, session: Session):
+        kilometers = self._kilometers.get(train_run_num_id)
+        if kilometers is None:
+            kilometers = list(session.exec(
+                select(Route.kilometers)
+                .where(Route.train_run_num_id == train_run_num_id)
+                .order_by(Route.sequence)
+            ).all())
+            self._kilometers[train_run_num_id] = kilometers
+        return kilometers
+
+    def run(self, train_run_id: int, session: Session):
+        run = self._runs.get(train_run_id)
+        if run is None:
+            row = session.exec(
+                select(TrainRun.train_run_num_id, Train.type)
+                .join(Train, TrainRun.train_id == Train.id)
+                .where(TrainRun.id == train_run_id)
+            ).first()
+            if row is None:
+                raise HTTPException(status_code=404, detail="TrainRun not found")
+            run = self._runs[train_run_id] = (row[0], row[1])
+        return run
+
+    def distance(self, train_run_num_id: int, start_seq: int, end_seq: int, session: Session):
+        kilometers = self.kilometers(train_run_num_id, session)
+        if start_seq < 1 or start_seq >= end_seq or end_seq > len(kilometers):
+            raise HTTPException(status_code=400, detail="Invalid route sequence")
+        return kilometers[end_seq - 1] - kilometers[start_seq - 1]
+
+    def price(self, train_type: str, carriage_type: str, distance: int):
+        return round(distance * price_multiple_dict[train_type] * price_multiple_dict[carriage_type], 2)
+
+    def invalidate_train_run_num(self, train_run_num_id: int):
+        self._kilometers.pop(train_run_num_id, None)
+
+    def invalidate_train_run(self, train_run_id: int):
+        self._runs.pop(train_run_id, None)
+
+
+fare_engine = FareEngine()
@@ -0,0 +1,99 @@
+import os
+import time
+import random
+import logging
+import sqlite3
+from contextvars import ContextVar
+from sqlalchemy import event
+from sql.metrics import db_lock_errors, db_write_duration
+
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", 100))
+# 超过阈值的语句按该比例抽样写入慢查询日志，1 表示全部记录
+SLOW_QUERY_SAMPLE_RATE = float(os.environ.get("SLOW_QUERY_SAMPLE_RATE", 1))
+SLOW_QUERY_MAX_LENGTH = 1000
+WRITE_STATEMENTS = ("insert", "update", "delete")
+
+DB_QUERY_COUNT_HEADER = "X-DB-Query-Count"
+DB_TIME_HEADER = "X-DB-Time-Ms"
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("sql.slow_query")
+
+
+class QueryStats:
+    __slots__ = ("label", "count", "seconds", "slowest_seconds", "slowest_statement")
+
+    def __init__(self, label: str):
+        self.label = label
+        self.count = 0
+        self.seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement = None
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+
+
+# 当前请求的统计对象；线程池中执行的路由函数会复制上下文，因此修改的是同一个对象
+current_query_stats: ContextVar[QueryStats | None] = ContextVar("current_query_stats", default=None)
+
+def start_request(label: str):
+    stats = QueryStats(label)
+    return stats, current_query_stats.set(stats)
+
+def finish_request(stats: QueryStats, token):
+    current_query_stats.reset(token)
+    logger.info(
+        "%s queries=%d db_ms=%.2f slowest_ms=%.2f slowest=%s",
+        stats.label, stats.count, stats.seconds * 1000, stats.slowest_seconds * 1000,
+        shorten(stats.slowest_statement) if stats.slowest_statement else "-"
+    )
+
+def query_stats_headers(stats: QueryStats):
+    return {
+        DB_QUERY_COUNT_HEADER: str(stats.count),
+        DB_TIME_HEADER: f"{stats.seconds * 1000:.2f}",
+    }
+
+def shorten(statement: str):
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= SLOW_QUERY_MAX_LENGTH else statement[:SLOW_QUERY_MAX_LENGTH] + "..."
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["query_started_at"].pop()
+    # 写语句会阻塞等待写锁，按语句类型记录耗时
+    verb = statement.lstrip()[:6].lower()
+    if verb in WRITE_STATEMENTS:
+        db_write_duration.observe(seconds, verb)
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.record(statement, seconds)
+    if seconds * 1000 >= SLOW_QUERY_THRESHOLD_MS and random.random() < SLOW_QUERY_SAMPLE_RATE:
+        # 不记录参数，避免密码等敏感数据进入日志
+        slow_query_logger.warning(
+            "slow query %.2f ms in %s: %s",
+            seconds * 1000, stats.label if stats is not None else "background", shorten(statement)
+        )
+
+def handle_error(exception_context):
+    # 出错的语句不会触发 after_cursor_execute，丢弃其开始时间
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started_at"):
+        connection.info["query_started_at"].pop()
+    # 等待超过 busy_timeout 仍未拿到写锁
+    exception = exception_context.original_exception
+    if isinstance(exception, sqlite3.OperationalError) and "locked" in str(exception):
+        db_lock_errors.inc()
+
+def instrument(engine):
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
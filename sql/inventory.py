@@ -0,0 +1,256 @@
+import os
+import threading
+import time
+from contextlib import contextmanager, ExitStack
+from fastapi import HTTPException
+from sqlmodel import Session, select
+from sql.models import TrainRun, TicketSlot, Seat, Carriage
+from sql.allocation import allocate, SEAT_ALLOCATION_STRATEGY
+
+# 其他进程（多 worker 部署、超时清理、导入脚本）对票位的修改不会通知本进程，缓存超过该秒数后使用前从数据库重新加载
+SEAT_INVENTORY_TTL_SECONDS = float(os.environ.get("SEAT_INVENTORY_TTL_SECONDS", 30))
+
+
+class SlotState:
+    __slots__ = ("id", "seat_id", "seat_num", "carriage_id", "carriage_num", "carriage_type", "occupancy")
+
+    def __init__(self, id: int, seat_id: int, seat_num: str, carriage_id: int, carriage_num: int, carriage_type: str, occupancy: int):
+        self.id = id
+        self.seat_id = seat_id
+        self.seat_num = seat_num
+        self.carriage_id = carriage_id
+        self.carriage_num = carriage_num
+        self.carriage_type = carriage_type
+        self.occupancy = occupancy
+
+
+class RunInventory:
+    def __init__(self, train_run_id: int, slots: list[SlotState]):
+        self.train_run_id = train_run_id
+        self.allocations = 0
+        self.slots_inspected = 0
+        self.load(slots)
+
+    def load(self, slots: list[SlotState]):
+        self.loaded_at = time.monotonic()
+        self.slots = slots
+        self.slot_map = {slot.id: slot for slot in slots}
+        # 按车厢类型统计各占用位图的座位数，查询余票时只需遍历不同的位图
+        self.occupancy_counts: dict[str, dict[int, int]] = {}
+        for slot in slots:
+            counts = self.occupancy_counts.setdefault(slot.carriage_type, {})
+            counts[slot.occupancy] = counts.get(slot.occupancy, 0) + 1
+
+    @property
+    def stale(self):
+        return time.monotonic() - self.loaded_at > SEAT_INVENTORY_TTL_SECONDS
+
+    def find(self, mask: int, full_mask: int, carriage_type: str | None = None):
+        slots = self.slots if carriage_type is None else [slot for slot in self.slots if slot.carriage_type == carriage_type]
+        slot, inspected = allocate(slots, mask, full_mask)
+        self.allocations += 1
+        self.slots_inspected += inspected
+        return slot
+
+    def find_group(self, mask: int, count: int, carriage_type: str | None = None):
+        slots = self.slots if carriage_type is None else [slot for slot in self.slots if slot.carriage_type == carriage_type]
+        carriages: dict[int, list[SlotState]] = {}
+        for slot in slots:
+            carriages.setdefault(slot.carriage_id, []).append(slot)
+
+        def fits(slot: SlotState):
+            return slot.occupancy & mask == 0
+
+        # 优先同一车厢内连续的座位
+        for carriage_slots in carriages.values():
+            window = []
+            for slot in carriage_slots:
+                window = window + [slot] if fits(slot) else []
+                if len(window) == count:
+                    return window
+        # 其次同一车厢内的任意座位
+        for carriage_slots in carriages.values():
+            free = [slot for slot in carriage_slots if fits(slot)]
+            if len(free) >= count:
+                return free[:count]
+        free = [slot for slot in slots if fits(slot)]
+        if len(free) >= count:
+            return free[:count]
+        return None
+
+    def set_occupancy(self, slot_id: int, occupancy: int):
+        slot = self.slot_map[slot_id]
+        counts = self.occupancy_counts[slot.carriage_type]
+        counts[occupancy] = counts.get(occupancy, 0) + 1
+        if counts[slot.occupancy] == 1:
+            del counts[slot.occupancy]
+        else:
+            counts[slot.occupancy] -= 1
+        slot.occupancy = occupancy
+
+    def availability(self, mask: int):
+        return {
+            carriage_type: sum(count for occupancy, count in list(counts.items()) if occupancy & mask == 0)
+            for carriage_type, counts in list(self.occupancy_counts.items())
+        }
+
+
+class SeatInventory:
+    def __init__(self):
+        self._runs: dict[int, RunInventory] = {}
+        # 每个车次一把锁，不同车次之间的订票互不阻塞；记录每把锁的使用者数量，无人使用且车次未缓存时删除
+        self._locks: dict[int, threading.Lock] = {}
+        self._lock_users: dict[int, int] = {}
+        self._registry_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.lock_waits = 0
+        self.lock_wait_seconds = 0.0
+        self.max_lock_wait_seconds = 0.0
+        self.conflicts = 0
+        self.refreshes = 0
+
+    def _acquire(self, train_run_id: int):
+        with self._registry_lock:
+            lock = self._locks.get(train_run_id)
+            if lock is None:
+                lock = self._locks[train_run_id] = threading.Lock()
+            self._lock_users[train_run_id] = self._lock_users.get(train_run_id, 0) + 1
+        if not lock.acquire(blocking=False):
+            started = time.perf_counter()
+            lock.acquire()
+            waited = time.perf_counter() - started
+            self.lock_waits += 1
+            self.lock_wait_seconds += waited
+            self.max_lock_wait_seconds = max(self.max_lock_wait_seconds, waited)
+        return lock
+
+    def _release(self, train_run_id: int, lock: threading.Lock):
+        lock.release()
+        with self._registry_lock:
+            users = self._lock_users[train_run_id] - 1
+            # 车次已结束、删除或被丢弃，且没有其他线程等待时，连同锁一起释放
+            if users == 0 and train_run_id not in self._runs:
+                del self._lock_users[train_run_id]
+                del self._locks[train_run_id]
+            else:
+                self._lock_users[train_run_id] = users
+
+    @contextmanager
+    def _locked(self, train_run_id: int):
+        lock = self._acquire(train_run_id)
+        try:
+            yield
+        finally:
+            self._release(train_run_id, lock)
+
+    def _load_slots(self, train_run_id: int, session: Session):
+        rows = session.exec(
+            select(TicketSlot.id, TicketSlot.seat_id, Seat.seat_num, Carriage.id, Carriage.num, Carriage.type, TicketSlot.occupancy)
+            .join(Seat, TicketSlot.seat_id == Seat.id)
+            .join(Carriage, Seat.carriage_id == Carriage.id)
+            .where(TicketSlot.train_run_id == train_run_id)
+            .order_by(Carriage.num, Seat.id)
+        ).all()
+        return [SlotState(*row) for row in rows]
+
+    def _load(self, train_run_id: int, session: Session):
+        return RunInventory(train_run_id, self._load_slots(train_run_id, session))
+
+    def refresh(self, run_inventory: RunInventory, session: Session):
+        # 调用方已持有该车次的锁；用数据库中的最新数据覆盖内存
+        self.refreshes += 1
+        run_inventory.load(self._load_slots(run_inventory.train_run_id, session))
+
+    def reload(self, run_inventory: RunInventory, session: Session):
+        # 条件更新冲突，说明数据库已被其他进程修改
+        self.conflicts += 1
+        self.refresh(run_inventory, session)
+
+    @contextmanager
+    def run(self, train_run_id: int, session: Session):
+        lock = self._acquire(train_run_id)
+        try:
+            run_inventory = self._runs.get(train_run_id)
+            if run_inventory is None:
+                self.misses += 1
+                run_inventory = self._runs[train_run_id] = self._load(train_run_id, session)
+            elif run_inventory.stale:
+                self.misses += 1
+                self.refresh(run_inventory, session)
+            else:
+                self.hits += 1
+            try:
+                yield run_inventory
+            except HTTPException:
+                raise
+            except Exception:
+                # 内存与数据库可能已不一致，丢弃后下次从数据库重新加载
+                self._runs.pop(train_run_id, None)
+                raise
+        finally:
+            self._release(train_run_id, lock)
+
+    @contextmanager
+    def runs(self, train_run_ids, session: Session):
+        # 按编号顺序加锁，避免多个车次同时加锁时死锁
+        with ExitStack() as stack:
+            yield {
+                train_run_id: stack.enter_context(self.run(train_run_id, session))
+                for train_run_id in sorted(train_run_ids)
+            }
+
+    def availability(self, train_run_id: int, mask: int, session: Session):
+        # 只读统计不加锁，已缓存且未过期的车次直接在内存中计算
+        run_inventory = self._runs.get(train_run_id)
+        if run_inventory is not None and not run_inventory.stale:
+            self.hits += 1
+            return run_inventory.availability(mask)
+        with self.run(train_run_id, session) as run_inventory:
+            return run_inventory.availability(mask)
+
+    def invalidate(self, train_run_id: int):
+        # 车次结束或删除时调用，释放锁时一并删除这把锁
+        with self._locked(train_run_id):
+            self._runs.pop(train_run_id, None)
+
+    def clear(self):
+        with self._registry_lock:
+            self._runs.clear()
+            for train_run_id in [train_run_id for train_run_id, users in self._lock_users.items() if users == 0]:
+                del self._lock_users[train_run_id]
+                del self._locks[train_run_id]
+
+    def rebuild(self, session: Session):
+        self.clear()
+        train_run_ids = session.exec(select(TrainRun.id).where(TrainRun.locked == True, TrainRun.finished == False)).all()
+        for train_run_id in train_run_ids:
+            with self._locked(train_run_id):
+                self._runs[train_run_id] = self._load(train_run_id, session)
+        return len(train_run_ids)
+
+    def stats(self):
+        total = self.hits + self.misses
+        run_inventories = list(self._runs.values())
+        allocations = sum(run_inventory.allocations for run_inventory in run_inventories)
+        slots_inspected = sum(run_inventory.slots_inspected for run_inventory in run_inventories)
+        return {
+            "strategy": SEAT_ALLOCATION_STRATEGY,
+            "runs": len(self._runs),
+            "locks": len(self._locks),
+            "slots": sum(len(run_inventory.slots) for run_inventory in run_inventories),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "lock_waits": self.lock_waits,
+            "lock_wait_seconds": self.lock_wait_seconds,
+            "max_lock_wait_seconds": self.max_lock_wait_seconds,
+            "conflicts": self.conflicts,
+            "refreshes": self.refreshes,
+            "ttl_seconds": SEAT_INVENTORY_TTL_SECONDS,
+            "allocations": allocations,
+            "avg_slots_inspected": slots_inspected / allocations if allocations else 0.0,
+        }
+
+
+seat_inventory = SeatInventory()
@@ -0,0 +1,378 @@
+import os
+import time
+import random
+import argparse
+import threading
+from collections import OrderedDict
+from bisect import bisect_left
+from datetime import date, time as dtime
+from sqlmodel import Session, select
+from sql.models import TrainRun, TrainRunNum, Route, Station
+
+INF = float("inf")
+# 同一车次标识当天的运行线路构成一个线路模式，换乘次数上限
+MAX_TRANSFERS = 2
+# 按日期缓存的时刻表数量与有效期；失效只在本进程内生效，其他进程的修改最迟在有效期后可见
+JOURNEY_CACHE_SIZE = int(os.environ.get("JOURNEY_CACHE_SIZE", 32))
+JOURNEY_CACHE_TTL_SECONDS = float(os.environ.get("JOURNEY_CACHE_TTL_SECONDS", 300))
+
+
+def to_minutes(value: dtime):
+    return value.hour * 60 + value.minute
+
+def to_time(minutes: int):
+    minutes = int(minutes) % 1440
+    return dtime(minutes // 60, minutes % 60)
+
+
+class Trip:
+    __slots__ = ("train_run_id", "arrivals", "departures")
+
+    def __init__(self, train_run_id: int, arrivals: list[int], departures: list[int]):
+        self.train_run_id = train_run_id
+        self.arrivals = arrivals
+        self.departures = departures
+
+
+class Pattern:
+    __slots__ = ("index", "train_run_num_id", "name", "stops", "sequences", "trips", "departures_at")
+
+    def __init__(self, index: int, train_run_num_id: int, name: str, stops: list[int], sequences: list[int]):
+        self.index = index
+        self.train_run_num_id = train_run_num_id
+        self.name = name
+        self.stops = stops
+        self.sequences = sequences
+        self.trips: list[Trip] = []
+        self.departures_at: list[list[int]] = []
+
+    def finish(self):
+        self.trips.sort(key=lambda trip: trip.departures[0])
+        self.departures_at = [[trip.departures[i] for trip in self.trips] for i in range(len(self.stops))]
+
+
+class Label:
+    __slots__ = ("arrival", "kind", "pattern", "trip", "board", "alight", "from_stop", "prev")
+
+    def __init__(self, arrival: float, kind: str, prev: "Label | None" = None, pattern: Pattern | None = None,
+                 trip: Trip | None = None, board: int = 0, alight: int = 0, from_stop: int = 0):
+        self.arrival = arrival
+        self.kind = kind
+        self.prev = prev
+        self.pattern = pattern
+        self.trip = trip
+        self.board = board
+        self.alight = alight
+        self.from_stop = from_stop
+
+
+class Timetable:
+    def __init__(self, stations, runs):
+        # stations: [(id, name, city)]
+        # runs: [(train_run_id, train_run_num_id, name, [(station_id, sequence, arrival_time, departure_time)])]
+        self.station_ids = [station[0] for station in stations]
+        self.names = [station[1] for station in stations]
+        self.stop_index = {station[0]: i for i, station in enumerate(stations)}
+        self.name_index = {station[1]: i for i, station in enumerate(stations)}
+        cities: dict[str, list[int]] = {}
+        for i, station in enumerate(stations):
+            cities.setdefault(station[2], []).append(i)
+        self.city_stops = [[j for j in cities[station[2]] if j != i] for i, station in enumerate(stations)]
+
+        patterns: dict[tuple, Pattern] = {}
+        for train_run_id, train_run_num_id, name, routes in runs:
+            stops = [self.stop_index[route[0]] for route in routes]
+            sequences = [route[1] for route in routes]
+            key = (train_run_num_id, tuple(stops))
+            pattern = patterns.get(key)
+            if pattern is None:
+                pattern = patterns[key] = Pattern(len(patterns), train_run_num_id, name, stops, sequences)
+            # 时刻回绕时视为跨过午夜
+            offset = 0
+            last = 0
+            arrivals, departures = [], []
+            for route in routes:
+                arrival = to_minutes(route[2]) + offset
+                if arrival < last:
+                    offset += 1440
+                    arrival += 1440
+                departure = to_minutes(route[3]) + offset
+                if departure < arrival:
+                    offset += 1440
+                    departure += 1440
+                arrivals.append(arrival)
+                departures.append(departure)
+                last = departure
+            pattern.trips.append(Trip(train_run_id, arrivals, departures))
+
+        self.patterns = list(patterns.values())
+        # stop_patterns 只含可上车的位置，serving_patterns 含所有经停位置
+        self.stop_patterns: list[list[tuple[Pattern, int]]] = [[] for _ in stations]
+        self.serving_patterns: list[list[tuple[Pattern, int]]] = [[] for _ in stations]
+        for pattern in self.patterns:
+            pattern.finish()
+            for position, stop in enumerate(pattern.stops):
+                self.serving_patterns[stop].append((pattern, position))
+                if position < len(pattern.stops) - 1:
+                    self.stop_patterns[stop].append((pattern, position))
+
+    def reaching(self, stops: set[int]):
+        # 乘一趟车（到站后可再同城换乘）就能到达 stops 的车站
+        result = set(stops)
+        for stop in stops:
+            for pattern, position in self.serving_patterns[stop]:
+                result.update(pattern.stops[:position])
+        for stop in list(result):
+            result.update(self.city_stops[stop])
+        return result
+
+    def last_useful_positions(self, stops: set[int]):
+        # 每个线路模式上最后一个有用车站的位置，扫描到此为止
+        positions: dict[int, int] = {}
+        for stop in stops:
+            for pattern, position in self.serving_patterns[stop]:
+                if positions.get(pattern.index, -1) < position:
+                    positions[pattern.index] = position
+        return positions
+
+    def plan(self, origin: int, target: int, departure_after: int = 0, max_transfers: int = MAX_TRANSFERS,
+             min_connection: int = 10, city_transfer: int = 30):
+        # 按轮次的 RAPTOR：第 k 轮得到乘坐 k 趟车能到达各站的最早时间
+        stop_count = len(self.station_ids)
+        best = [INF] * stop_count
+        ready = [INF] * stop_count
+        ready_labels: list[Label | None] = [None] * stop_count
+        ready[origin] = departure_after
+        ready_labels[origin] = Label(departure_after, "origin")
+        best[origin] = departure_after
+        marked = {origin}
+        journeys = []
+
+        # 最后两轮只需考虑还能到达终点的车站和线路，其余轮次不做限制
+        rounds = max_transfers + 1
+        last_stops = {target} | set(self.city_stops[target])
+        useful_stops: list[set[int] | None] = [None] * rounds
+        useful_stops[rounds - 1] = last_stops
+        if rounds > 1:
+            useful_stops[rounds - 2] = self.reaching(last_stops)
+
+        for k in range(rounds):
+            useful = useful_stops[k]
+            last_positions = self.last_useful_positions(useful) if useful is not None else None
+            queue: dict[int, tuple[Pattern, int]] = {}
+            for stop in marked:
+                for pattern, position in self.stop_patterns[stop]:
+                    if last_positions is not None and last_positions.get(pattern.index, -1) <= position:
+                        continue
+                    current = queue.get(pattern.index)
+                    if current is None or position < current[1]:
+                        queue[pattern.index] = (pattern, position)
+
+            arrivals: dict[int, Label] = {}
+            target_best = best[target]
+            for pattern, start in queue.values():
+                stops = pattern.stops
+                end = len(stops) if last_positions is None else last_positions[pattern.index] + 1
+                trip = None
+                board = 0
+                boarded_label = None
+                for position in range(start, end):
+                    stop = stops[position]
+                    if trip is not None:
+                        arrival = trip.arrivals[position]
+                        # 晚于终点已知最早到达时间的到站不会改进结果
+                        if arrival < target_best and arrival < best[stop] and (useful is None or stop in useful):
+                            best[stop] = arrival
+                            arrivals[stop] = Label(arrival, "trip", boarded_label, pattern, trip, board, position)
+                            if stop == target:
+                                target_best = arrival
+                    ready_time = ready[stop]
+                    if ready_time < INF and position < end - 1:
+                        if trip is None or ready_time <= trip.departures[position]:
+                            departures = pattern.departures_at[position]
+                            i = bisect_left(departures, ready_time)
+                            if i < len(departures) and (trip is None or departures[i] < trip.departures[position]):
+                                trip = pattern.trips[i]
+                                board = position
+                                boarded_label = ready_labels[stop]
+
+            if not arrivals:
+                break
+
+            # 同站换乘需留出最短换乘时间，同城不同车站之间另计步行换乘时间
+            marked = set()
+            for stop, label in arrivals.items():
+                if label.arrival + min_connection < ready[stop]:
+                    ready[stop] = label.arrival + min_connection
+                    ready_labels[stop] = label
+                    marked.add(stop)
+            for stop, label in list(arrivals.items()):
+                for other in self.city_stops[stop]:
+                    arrival = label.arrival + city_transfer
+                    if arrival < ready[other]:
+                        walk = Label(arrival, "walk", label, from_stop=stop)
+                        ready[other] = arrival
+                        ready_labels[other] = walk
+                        marked.add(other)
+                        if arrival < best[other]:
+                            best[other] = arrival
+                            if other == target:
+                                arrivals[other] = walk
+
+            if target in arrivals:
+                journeys.append(self.itinerary(arrivals[target]))
+            if not marked:
+                break
+
+        return journeys
+
+    def itinerary(self, label: Label):
+        legs = []
+        while label is not None and label.kind != "origin":
+            if label.kind == "trip":
+                pattern = label.pattern
+                legs.append({
+                    "train_run_id": label.trip.train_run_id,
+                    "train_run_num_id": pattern.train_run_num_id,
+                    "train_run_num_name": pattern.name,
+                    "start_station": self.names[pattern.stops[label.board]],
+                    "end_station": self.names[pattern.stops[label.alight]],
+                    "start_seq": pattern.sequences[label.board],
+                    "end_seq": pattern.sequences[label.alight],
+                    "departure": label.trip.departures[label.board],
+                    "arrival": label.trip.arrivals[label.alight],
+                })
+            label = label.prev
+        legs.reverse()
+        return legs
+
+
+class JourneyPlanner:
+    def __init__(self, maxsize: int = JOURNEY_CACHE_SIZE, ttl: float = JOURNEY_CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # 日期 -> (时刻表, 过期时间)
+        self._timetables: OrderedDict[date, tuple[Timetable, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _load(self, running_date: date, session: Session):
+        stations = session.exec(select(Station.id, Station.name, Station.city).order_by(Station.id)).all()
+        rows = session.exec(
+            select(TrainRun.id, TrainRun.train_run_num_id, TrainRunNum.name, Route.station_id, Route.sequence, Route.arrival_time, Route.departure_time)
+            .join(TrainRunNum, TrainRunNum.id == TrainRun.train_run_num_id)
+            .join(Route, Route.train_run_num_id == TrainRun.train_run_num_id)
+            .where(
+                TrainRunNum.deprecated == False,
+                TrainRun.locked == True,
+                TrainRun.finished == False,
+                TrainRun.running_date == running_date
+            )
+            .order_by(TrainRun.id, Route.sequence)
+        ).all()
+        runs = {}
+        for train_run_id, train_run_num_id, name, station_id, sequence, arrival_time, departure_time in rows:
+            run = runs.get(train_run_id)
+            if run is None:
+                run = runs[train_run_id] = (train_run_id, train_run_num_id, name, [])
+            run[3].append((station_id, sequence, arrival_time, departure_time))
+        return Timetable(stations, list(runs.values()))
+
+    def timetable(self, running_date: date, session: Session):
+        # 加载在锁内进行，同一日期并发查询时只加载一次
+        with self._lock:
+            entry = self._timetables.get(running_date)
+            if entry is not None and entry[1] >= time.monotonic():
+                self._timetables.move_to_end(running_date)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                self.expirations += 1
+            self.misses += 1
+            timetable = self._load(running_date, session)
+            self._timetables[running_date] = (timetable, time.monotonic() + self.ttl)
+            self._timetables.move_to_end(running_date)
+            while len(self._timetables) > self.maxsize:
+                self._timetables.popitem(last=False)
+                self.evictions += 1
+            return timetable
+
+    def invalidate_date(self, running_date: date):
+        with self._lock:
+            self._timetables.pop(running_date, None)
+
+    def clear(self):
+        with self._lock:
+            self._timetables.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._timetables),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+journey_planner = JourneyPlanner()
+
+
+# 基准测试：在随机生成的全国规模路网上测量查询耗时
+def synthetic_timetable(stations: int, cities: int, lines: int, seed: int = 0):
+    rng = random.Random(seed)
+    station_rows = [(i, f"S{i}", f"C{i % cities}") for i in range(stations)]
+    # 少量枢纽站让线路彼此相交
+    hubs = rng.sample(range(stations), max(1, stations // 50))
+    runs = []
+    for line in range(lines):
+        stop_count = rng.randint(6, 25)
+        stops = rng.sample(range(stations), stop_count - 2) + rng.sample(hubs, min(2, len(hubs)))
+        rng.shuffle(stops)
+        stops = list(dict.fromkeys(stops))
+        minutes = rng.randint(5 * 60, 20 * 60)
+        routes = []
+        for sequence, station_id in enumerate(stops, 1):
+            arrival = minutes
+            departure = minutes + 2
+            routes.append((station_id, sequence, to_time(arrival), to_time(departure)))
+            minutes = departure + rng.randint(15, 60)
+        runs.append((line, line, f"G{line}", routes))
+    return Timetable(station_rows, runs)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the journey planner on a synthetic network")
+    parser.add_argument("--stations", type=int, default=3000)
+    # 多数城市只有一个车站
+    parser.add_argument("--cities", type=int, default=2500)
+    parser.add_argument("--lines", type=int, default=4000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    timetable = synthetic_timetable(args.stations, args.cities, args.lines, args.seed)
+    print(f"build: {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    rng = random.Random(args.seed)
+    durations = []
+    found = 0
+    for _ in range(args.queries):
+        origin, target = rng.sample(range(args.stations), 2)
+        started = time.perf_counter()
+        journeys = timetable.plan(origin, target, departure_after=6 * 60)
+        durations.append((time.perf_counter() - started) * 1000)
+        found += bool(journeys)
+    durations.sort()
+    print(f"queries: {args.queries}, with result: {found}")
+    print(f"p50: {durations[len(durations) // 2]:.2f} ms, p95: {durations[int(len(durations) * 0.95)]:.2f} ms, max: {durations[-1]:.2f} ms")
+
+if __name__ == "__main__":
+    main()
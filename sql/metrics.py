@@ -0,0 +1,187 @@
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from fastapi import HTTPException
+from sql.inventory import seat_inventory
+from sql.cache import search_cache
+
+# 不依赖 prometheus_client 的最小实现，按 Prometheus 文本格式输出
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def format_labels(names: tuple, values: tuple, extra: str = ""):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def format_value(value: float):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        super().__init__(name, help, labelnames)
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, *labels, value: float = 1):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + value
+
+    def render(self):
+        lines = self.header()
+        for labels, value in list(self.values.items()):
+            lines.append(f"{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *labels, value: float):
+        with self._lock:
+            self.values[labels] = value
+
+    def dec(self, *labels, value: float = 1):
+        self.inc(*labels, value=-value)
+
+
+class ObservedCounter(Gauge):
+    # 由其他模块累计、抓取时读取的单调计数
+    kind = "counter"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = buckets
+        # 每组标签对应 [各桶计数（非累计）..., 总和, 总数]
+        self.values: dict[tuple, list] = {}
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self.values.get(labels)
+            if state is None:
+                state = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self):
+        lines = self.header()
+        for labels, state in list(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state):
+                cumulative += count
+                bucket_labels = format_labels(self.labelnames, labels, 'le="' + format_value(bound) + '"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, labels)} {format_value(state[-2])}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, labels)} {state[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[Metric] = []
+        # 抓取时调用的回调，用于从库存、缓存等模块读取当前统计
+        self.collectors = []
+
+    def register(self, metric: Metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        for collect in self.collectors:
+            collect()
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route")))
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status code", ("method", "route", "status")))
+http_requests_in_progress = registry.register(Gauge(
+    "http_requests_in_progress", "HTTP requests currently being handled"))
+db_queries = registry.register(Counter(
+    "db_queries_total", "SQL statements executed by route", ("method", "route")))
+db_seconds = registry.register(Counter(
+    "db_seconds_total", "Time spent executing SQL statements by route", ("method", "route")))
+db_lock_errors = registry.register(Counter(
+    "db_lock_errors_total", "Statements that failed after waiting busy_timeout for the SQLite write lock"))
+# SQLite 没有暴露等锁时间，写语句的耗时包含等待写锁的时间，高分位的升高即为锁等待
+db_write_duration = registry.register(Histogram(
+    "db_write_duration_seconds", "Duration of INSERT, UPDATE and DELETE statements, including time blocked on the SQLite write lock",
+    ("statement",)))
+orders = registry.register(Counter(
+    "orders_total", "Order state changes", ("event",)))
+booking_failures = registry.register(Counter(
+    "booking_failures_total", "Rejected booking requests by reason", ("reason",)))
+
+inventory_runs = registry.register(Gauge(
+    "inventory_runs", "Train runs held in the in-memory seat inventory"))
+inventory_slots = registry.register(Gauge(
+    "inventory_slots", "Ticket slots held in the in-memory seat inventory"))
+inventory_lock_waits = registry.register(ObservedCounter(
+    "inventory_lock_waits_total", "Bookings that had to wait for a train run lock"))
+inventory_lock_wait_seconds = registry.register(ObservedCounter(
+    "inventory_lock_wait_seconds_total", "Total time spent waiting for train run locks"))
+inventory_conflicts = registry.register(ObservedCounter(
+    "inventory_conflicts_total", "Seat allocations that lost a race with another writer"))
+inventory_refreshes = registry.register(ObservedCounter(
+    "inventory_refreshes_total", "Train run inventories reloaded from the database"))
+search_cache_requests = registry.register(ObservedCounter(
+    "search_cache_requests_total", "Train run search cache lookups", ("result",)))
+
+def collect_inventory():
+    stats = seat_inventory.stats()
+    inventory_runs.set(value=stats["runs"])
+    inventory_slots.set(value=stats["slots"])
+    inventory_lock_waits.set(value=stats["lock_waits"])
+    inventory_lock_wait_seconds.set(value=stats["lock_wait_seconds"])
+    inventory_conflicts.set(value=stats["conflicts"])
+    inventory_refreshes.set(value=stats["refreshes"])
+    search_cache_requests.set("hit", value=search_cache.hits)
+    search_cache_requests.set("miss", value=search_cache.misses)
+
+registry.collectors.append(collect_inventory)
+
+
+@contextmanager
+def record_booking_failures():
+    try:
+        yield
+    except HTTPException as exception:
+        booking_failures.inc(exception.detail)
+        raise
+    except Exception:
+        booking_failures.inc("Internal error")
+        raise
@@ -0,0 +1,125 @@
+import argparse
+from datetime import datetime
+from sqlalchemy import inspect, bindparam
+from sqlmodel import SQLModel, Field, select, update, insert, func
+from sql.database import engine
+from sql.models import Ticket, TicketSlot, TicketSlotStatus, Order, OrderStatus, TrainRun, Route
+
+
+class SchemaVersion(SQLModel, table=True):
+    __tablename__ = "schema_version"
+    version: int = Field(primary_key=True)
+    description: str
+    applied_at: datetime
+
+
+# 每个迁移只做增量修改，且在新建的数据库上重复执行也不会出错
+def add_ticket_slot_occupancy(connection):
+    columns = {column["name"] for column in inspect(connection).get_columns("ticket_slot")}
+    if "occupancy" in columns:
+        return
+    connection.exec_driver_sql("ALTER TABLE ticket_slot ADD COLUMN occupancy INTEGER NOT NULL DEFAULT 0")
+    # 由未取消订单的车票回填座位占用位图
+    rows = connection.execute(
+        select(Ticket.ticket_slot_id, Ticket.start_sequence, Ticket.end_sequence)
+        .join(Order, Order.ticket_id == Ticket.id)
+        .where(Order.status != OrderStatus.cancelled)
+    ).all()
+    occupancies: dict[int, int] = {}
+    for ticket_slot_id, start_sequence, end_sequence in rows:
+        mask = ((1 << (end_sequence - start_sequence)) - 1) << (start_sequence - 1)
+        occupancies[ticket_slot_id] = occupancies.get(ticket_slot_id, 0) | mask
+
+    # 旧版本的直达票占用整个座位但车票只记录乘车区间，因此原状态为 full 且仍有有效车票的座位按整条线路占用；
+    # 旧版本取消订单也不释放座位，没有有效车票的座位不论原状态都视为空闲，所有座位的状态按回填后的位图重新计算
+    route_counts = (
+        select(Route.train_run_num_id, func.count(Route.id).label("routes"))
+        .group_by(Route.train_run_num_id)
+        .subquery()
+    )
+    slots = connection.execute(
+        select(TicketSlot.id, TicketSlot.status, route_counts.c.routes)
+        .join(TrainRun, TicketSlot.train_run_id == TrainRun.id)
+        .join(route_counts, route_counts.c.train_run_num_id == TrainRun.train_run_num_id)
+    ).all()
+    changes = []
+    for slot_id, status, routes in slots:
+        full_mask = (1 << (routes - 1)) - 1
+        occupancy = occupancies.get(slot_id, 0)
+        if status == TicketSlotStatus.full and slot_id in occupancies:
+            occupancy |= full_mask
+        if occupancy & full_mask == full_mask:
+            new_status = TicketSlotStatus.full
+        elif occupancy == 0:
+            new_status = TicketSlotStatus.empty
+        else:
+            new_status = TicketSlotStatus.remaining
+        if occupancy or new_status != status:
+            changes.append({"slot_id": slot_id, "slot_occupancy": occupancy, "slot_status": new_status})
+    if changes:
+        connection.execute(
+            update(TicketSlot)
+            .where(TicketSlot.id == bindparam("slot_id"))
+            .values(occupancy=bindparam("slot_occupancy"), status=bindparam("slot_status")),
+            changes
+        )
+
+def add_ticket_occupancy(connection):
+    columns = {column["name"] for column in inspect(connection).get_columns("ticket")}
+    if "occupancy" in columns:
+        return
+    # 已有车票保持为空，释放时按乘车区间计算
+    connection.exec_driver_sql("ALTER TABLE ticket ADD COLUMN occupancy BIGINT")
+
+def widen_occupancy_columns(connection):
+    # SQLite 的 INTEGER 本就是 64 位，其他数据库需要改为 BIGINT
+    if connection.dialect.name == "sqlite":
+        return
+    connection.exec_driver_sql("ALTER TABLE ticket_slot ALTER COLUMN occupancy TYPE BIGINT")
+
+def add_model_indexes(connection):
+    # create_all 不会给已存在的表补建索引，这里按模型中声明的索引逐个补建
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+# 新增迁移时追加到末尾并使用更大的版本号；之后再给模型加索引时追加一条 add_model_indexes 即可
+MIGRATIONS = [
+    (1, "Add ticket_slot.occupancy and backfill it from tickets", add_ticket_slot_occupancy),
+    (2, "Add indexes declared on models", add_model_indexes),
+    (3, "Add index on order.ticket_id", add_model_indexes),
+    (4, "Add ticket.occupancy", add_ticket_occupancy),
+    (5, "Widen ticket_slot.occupancy to 64 bits", widen_occupancy_columns),
+]
+
+
+def current_version(bind=engine):
+    with bind.connect() as connection:
+        SchemaVersion.__table__.create(connection, checkfirst=True)
+        connection.commit()
+        return connection.execute(select(func.max(SchemaVersion.version))).scalar() or 0
+
+def run_migrations(bind=engine):
+    # 每个迁移在单独的事务中执行并记录版本，失败时该迁移整体回滚
+    version = current_version(bind)
+    applied = []
+    for migration_version, description, migrate in MIGRATIONS:
+        if migration_version <= version:
+            continue
+        with bind.begin() as connection:
+            migrate(connection)
+            connection.execute(insert(SchemaVersion).values(version=migration_version, description=description, applied_at=datetime.now()))
+        applied.append(migration_version)
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations to the database")
+    parser.parse_args()
+
+    SQLModel.metadata.create_all(engine)
+    applied = run_migrations()
+    print(f"applied: {applied or 'none'}, schema version: {current_version()}")
+
+if __name__ == "__main__":
+    main()
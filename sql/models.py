@@ -1,4 +1,4 @@
-from sqlmodel import SQLModel, Field, Relationship
+from sqlmodel import SQLModel, Field, Relationship, Index, BigInteger
 from enum import Enum
 from datetime import datetime, date, time
 from typing import List
@@ -8,6 +8,11 @@ class OrderStatus(str, Enum):
     completed = "completed"
     cancelled = "cancelled"
 
+# 座位占用位图为 64 位有符号整数，每段占一位，线路最多 63 段
+MAX_ROUTE_STOPS = 64
+# 团体票一次最多出票的乘客数，整组在一个事务中持有车次的库存锁
+MAX_GROUP_SIZE = 10
+
 class TicketSlotStatus(str, Enum):
     empty = "empty"
     full = "full"
@@ -31,7 +36,7 @@ class Admin(SQLModel, table=True):
 
 class User(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
-    name: str
+    name: str = Field(index=True)
     telephone: str
     password: str
     banned: bool = False
@@ -41,10 +46,15 @@ class User(SQLModel, table=True):
 
 class TicketSlot(SQLModel, table=True):
     __tablename__ = "ticket_slot"
+    __table_args__ = (
+        Index("ix_ticket_slot_run_status", "train_run_id", "status"),
+    )
     id: int | None = Field(default=None, primary_key=True)
     train_run_id: int = Field(foreign_key="train_run.id")
     seat_id: int = Field(foreign_key="seat.id")
     status: TicketSlotStatus
+    # 第 i 位表示第 i+1 站到第 i+2 站这一段已被占用
+    occupancy: int = Field(default=0, sa_type=BigInteger)
 
     train_run: "TrainRun" = Relationship(back_populates="ticket_slots")
     seat: "Seat" = Relationship(back_populates="ticket_slots")
@@ -59,15 +69,21 @@ class Ticket(SQLModel, table=True):
     used: bool = False
     start_sequence: int
     end_sequence: int
+    # 出票时在座位上占用的区段位图；直达票占用整条线路，不等于乘车区间。旧数据为空，按乘车区间计算
+    occupancy: int | None = Field(default=None, sa_type=BigInteger)
 
     ticket_slot: TicketSlot = Relationship(back_populates="tickets")
     order: "Order" = Relationship(back_populates="ticket")
 
 
 class Order(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_order_status_created_at", "status", "created_at"),
+        Index("ix_order_user_id_created_at", "user_id", "created_at"),
+    )
     id: int | None = Field(default=None, primary_key=True)
     user_id: int | None = Field(foreign_key="user.id")
-    ticket_id: int | None = Field(foreign_key="ticket.id")
+    ticket_id: int | None = Field(foreign_key="ticket.id", index=True)
     status: OrderStatus
     created_at: datetime
     completed_at: datetime | None = None
@@ -79,6 +95,10 @@ class Order(SQLModel, table=True):
 
 class TrainRun(SQLModel, table=True):
     __tablename__ = "train_run"
+    __table_args__ = (
+        Index("ix_train_run_num_date", "train_run_num_id", "running_date"),
+        Index("ix_train_run_running_date", "running_date"),
+    )
     id: int | None = Field(default=None, primary_key=True)
     train_id: int = Field(foreign_key="train.id")
     train_run_num_id: int = Field(foreign_key="train_run_num.id")
@@ -133,6 +153,9 @@ class TrainRunNum(SQLModel, table=True):
 
 
 class Route(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_route_num_station", "train_run_num_id", "station_id"),
+    )
     id: int | None = Field(default=None, primary_key=True)
     train_run_num_id: int = Field(foreign_key="train_run_num.id")
     station_id: int = Field(foreign_key="station.id")
@@ -147,7 +170,7 @@ class Route(SQLModel, table=True):
 
 class Station(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
-    name: str
+    name: str = Field(index=True)
     city: str
     deprecated: bool = False
 
@@ -156,3 +179,18 @@ class Station(SQLModel, table=True):
 
 
 
+
+
+
+# 起讫站索引：每条线路上任意两站 (前站, 后站) 各一行，由线路的站点生成
+class StationPair(SQLModel, table=True):
+    __tablename__ = "station_pair"
+    __table_args__ = (
+        Index("ix_station_pair_stations", "start_station_id", "end_station_id"),
+    )
+    id: int | None = Field(default=None, primary_key=True)
+    start_station_id: int = Field(foreign_key="station.id")
+    end_station_id: int = Field(foreign_key="station.id")
+    train_run_num_id: int = Field(foreign_key="train_run_num.id", index=True)
+    start_sequence: int
+    end_sequence: int
\ No newline at end of file
@@ -0,0 +1,48 @@
+import os
+import json
+from base64 import urlsafe_b64encode, urlsafe_b64decode
+from fastapi import HTTPException, Response
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# 单页条数上限，接口参数校验之外再兜底截断，避免一次请求加载整张表
+MAX_PAGE_SIZE = int(os.environ.get("MAX_PAGE_SIZE", 100))
+
+
+# 游标是排序键取值的 JSON 数组经 base64 编码后的字符串，客户端只需原样传回
+def encode_cursor(*values):
+    content = json.dumps(values, separators=(",", ":")).encode()
+    return urlsafe_b64encode(content).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int):
+    try:
+        values = json.loads(urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def paginate(statement, id_column, offset: int, limit: int, cursor: str | None, session):
+    # 按主键的键集分页：带游标时从上一页最后一条之后继续，否则退回 offset 分页
+    if limit < 0 or offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid offset or limit")
+    limit = min(limit, MAX_PAGE_SIZE)
+    if cursor is not None:
+        last_id, = decode_cursor(cursor, 1)
+        if not isinstance(last_id, int):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        statement = statement.where(id_column > last_id)
+    elif offset:
+        statement = statement.offset(offset)
+    # 多取一条判断是否还有下一页
+    rows = session.exec(statement.order_by(id_column).limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        if rows:
+            next_cursor = encode_cursor(getattr(rows[-1], id_column.key))
+    return rows, next_cursor
+
+def set_next_cursor(response: Response, next_cursor: str | None):
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
@@ -1,7 +1,7 @@
-from pydantic import BaseModel
-from .models import TrainType, CarriageType
+from pydantic import BaseModel, Field
+from .models import TrainType, CarriageType, OrderStatus, MAX_GROUP_SIZE
 from datetime import time, date, datetime
-from typing import List, Optional
+from typing import List, Optional, Dict
 
 # admin schemas
 class AdminLogin(BaseModel):
@@ -12,6 +12,22 @@ class AdminOut(BaseModel):
     id: int
     name: str
 
+class DashboardOut(BaseModel):
+    users: int
+    orders: int
+    trains: int
+    stations: int
+    runs: int
+    nums: int
+    orders_by_status: Dict[OrderStatus, int]
+    bookings_today: int
+    refreshed_at: datetime | None
+
+class Token(BaseModel):
+    access_token: str
+    token_type: str
+    expires_in: int
+
 
 # User schemas
 class UserBase(BaseModel):
@@ -52,7 +68,22 @@ class OrderCreate(BaseModel):
     start_seq: int
     end_route_id: int
     end_seq: int
-    price: float
+    carriage_type: CarriageType | None = None
+    # 票价由服务端计算，保留该字段仅为兼容旧客户端
+    price: float | None = None
+
+class OrderBatchCreate(BaseModel):
+    user_ids: List[int] = Field(max_length=MAX_GROUP_SIZE)
+    is_through: bool = False
+    total_routes: int
+    train_run_id: int
+    train_run_num_id: int
+    start_route_id: int
+    start_seq: int
+    end_route_id: int
+    end_seq: int
+    carriage_type: CarriageType | None = None
+    price: float | None = None
 
 class OrderOut(OrderBase):
     id: int
@@ -183,10 +214,25 @@ class TrainRunDemand(TrainRunBase):
     start_station: str
     end_station: str
 
+class JourneyDemand(TrainRunDemand):
+    departure_after: time | None = None
+    max_transfers: int = 2
+    # 同站换乘与同城不同车站换乘的最短间隔（分钟）
+    min_connection_minutes: int = 10
+    city_transfer_minutes: int = 30
+
 class TrainRunCreate(TrainRunBase):
     train_id: int
     train_run_num_id: int
 
+class TrainRunSchedule(BaseModel):
+    train_id: int
+    train_run_num_id: int
+    start_date: date
+    end_date: date
+    # 0 为周一，6 为周日
+    weekdays: List[int] = [0, 1, 2, 3, 4, 5, 6]
+
 class TrainRunOut(TrainRunBase):
     id: int
     locked: bool
@@ -211,6 +257,37 @@ class TrainRunUpdate(BaseModel):
 class TrainRunFinish(BaseModel):
     finished: bool = True
 
+class TrainRunQuote(BaseModel):
+    train_run_id: int
+    start_seq: int
+    end_seq: int
+    kilometers: int
+    prices: Dict[CarriageType, float]
+
+class TrainRunAvailability(BaseModel):
+    train_run_id: int
+    start_seq: int
+    end_seq: int
+    seats: Dict[CarriageType, int]
+
+class JourneyLeg(BaseModel):
+    train_run_id: int
+    train_run_num_id: int
+    train_run_num_name: str
+    start_station: str
+    end_station: str
+    start_seq: int
+    end_seq: int
+    departure_time: time
+    arrival_time: time
+
+class Journey(BaseModel):
+    transfers: int
+    departure_time: time
+    arrival_time: time
+    duration_minutes: int
+    legs: List[JourneyLeg]
+
 
 # Ticket schemas
 class TicketOut(BaseModel):
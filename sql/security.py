@@ -0,0 +1,197 @@
+import os
+import hmac
+import json
+import time
+import base64
+import hashlib
+import logging
+import asyncio
+import secrets
+import threading
+from typing import Annotated
+from anyio import CapacityLimiter, to_thread
+from fastapi import HTTPException, Depends
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlmodel import Session, select
+from sql.database import engine
+from sql.models import User
+
+PASSWORD_HASH_ALGORITHM = "pbkdf2_sha256"
+PASSWORD_HASH_ITERATIONS = int(os.environ.get("PASSWORD_HASH_ITERATIONS", 600_000))
+# 哈希是 CPU 密集运算，在单独限流的线程中计算，登录高峰不占用处理其他请求的线程池和数据库连接
+PASSWORD_HASH_CONCURRENCY = int(os.environ.get("PASSWORD_HASH_CONCURRENCY", os.cpu_count() or 1))
+
+# 未配置时每次启动随机生成，重启后之前签发的令牌全部失效；多进程部署必须配置相同的密钥
+AUTH_SECRET_KEY = os.environ.get("AUTH_SECRET_KEY", "")
+ACCESS_TOKEN_TTL_SECONDS = int(os.environ.get("ACCESS_TOKEN_TTL_SECONDS", 900))
+# 受保护的接口必须携带令牌；设为 0 时只校验携带的令牌，仅用于过渡期兼容尚未接入令牌的客户端，管理接口始终需要令牌
+AUTH_REQUIRED = os.environ.get("AUTH_REQUIRED", "1") == "1"
+# 其他进程的封禁与解封不会通知本进程，定期从数据库重新加载封禁名单
+AUTH_REFRESH_SECONDS = float(os.environ.get("AUTH_REFRESH_SECONDS", 60))
+
+logger = logging.getLogger(__name__)
+
+hash_limiter = CapacityLimiter(PASSWORD_HASH_CONCURRENCY)
+secret_key = AUTH_SECRET_KEY.encode() or secrets.token_bytes(32)
+if not AUTH_SECRET_KEY:
+    logger.warning("AUTH_SECRET_KEY is not set, access tokens will not survive a restart")
+
+
+# 密码以 算法$迭代次数$盐$哈希 的形式保存，不含 $ 的旧数据视为明文，登录成功后升级
+def b64encode(content: bytes):
+    return base64.urlsafe_b64encode(content).decode().rstrip("=")
+
+def b64decode(content: str):
+    return base64.urlsafe_b64decode(content + "=" * (-len(content) % 4))
+
+def pbkdf2(password: str, salt: bytes, iterations: int):
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+
+def hash_password(password: str, iterations: int = PASSWORD_HASH_ITERATIONS):
+    salt = secrets.token_bytes(16)
+    return f"{PASSWORD_HASH_ALGORITHM}${iterations}${b64encode(salt)}${b64encode(pbkdf2(password, salt, iterations))}"
+
+def verify_password(password: str, password_hash: str):
+    algorithm, _, rest = password_hash.partition("$")
+    if algorithm != PASSWORD_HASH_ALGORITHM:
+        return hmac.compare_digest(password.encode(), password_hash.encode())
+    iterations, salt, expected = rest.split("$")
+    return hmac.compare_digest(pbkdf2(password, b64decode(salt), int(iterations)), b64decode(expected))
+
+def password_needs_rehash(password_hash: str):
+    algorithm, _, rest = password_hash.partition("$")
+    return algorithm != PASSWORD_HASH_ALGORITHM or int(rest.split("$")[0]) != PASSWORD_HASH_ITERATIONS
+
+# 供接口调用：在 hash_limiter 限流的线程中计算，调用方不应持有数据库连接
+async def hash_password_async(password: str):
+    return await to_thread.run_sync(hash_password, password, limiter=hash_limiter)
+
+async def verify_password_async(password: str, password_hash: str):
+    return await to_thread.run_sync(verify_password, password, password_hash, limiter=hash_limiter)
+
+
+class TokenClaims:
+    __slots__ = ("subject", "role", "issued_at", "expires_at", "token_id")
+
+    def __init__(self, subject: int, role: str, issued_at: float, expires_at: float, token_id: str):
+        self.subject = subject
+        self.role = role
+        self.issued_at = issued_at
+        self.expires_at = expires_at
+        self.token_id = token_id
+
+    @property
+    def is_admin(self):
+        return self.role == "admin"
+
+
+# 令牌为 base64(JSON 载荷).base64(HMAC-SHA256 签名)，校验只需计算签名，不查询数据库
+def sign(content: bytes):
+    return hmac.new(secret_key, content, hashlib.sha256).digest()
+
+def create_access_token(subject: int, role: str, ttl: int = ACCESS_TOKEN_TTL_SECONDS):
+    issued_at = time.time()
+    payload = {"sub": subject, "role": role, "iat": issued_at, "exp": issued_at + ttl, "jti": secrets.token_urlsafe(12)}
+    content = b64encode(json.dumps(payload, separators=(",", ":")).encode())
+    return {"access_token": f"{content}.{b64encode(sign(content.encode()))}", "token_type": "bearer", "expires_in": ttl}
+
+def decode_access_token(token: str):
+    content, _, signature = token.partition(".")
+    try:
+        valid = hmac.compare_digest(sign(content.encode()), b64decode(signature))
+        payload = json.loads(b64decode(content)) if valid else None
+        claims = TokenClaims(payload["sub"], payload["role"], payload["iat"], payload["exp"], payload["jti"]) if valid else None
+    except (ValueError, TypeError, KeyError):
+        claims = None
+    if claims is None or claims.expires_at < time.time():
+        raise HTTPException(status_code=401, detail="Invalid or expired token", headers={"WWW-Authenticate": "Bearer"})
+    return claims
+
+
+class AuthCache:
+    # 进程内的封禁与吊销状态；多进程部署时其他进程的封禁与解封在下次刷新后生效，吊销最迟在令牌过期后生效
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.banned_users: set[int] = set()
+        # (角色, 编号) -> 该时间之前签发的令牌失效（修改密码、删除用户）
+        self.revoked_before: dict[tuple[str, int], float] = {}
+        # 主动登出的令牌 -> 过期时间
+        self.revoked_tokens: dict[str, float] = {}
+
+    def load(self, session: Session):
+        banned_users = set(session.exec(select(User.id).where(User.banned == True)).all())
+        with self._lock:
+            self.banned_users = banned_users
+
+    def set_banned(self, user_id: int, banned: bool):
+        with self._lock:
+            if banned:
+                self.banned_users.add(user_id)
+            else:
+                self.banned_users.discard(user_id)
+
+    def revoke_subject(self, role: str, subject: int):
+        with self._lock:
+            self.revoked_before[(role, subject)] = time.time()
+
+    def revoke_token(self, claims: TokenClaims):
+        now = time.time()
+        with self._lock:
+            self.revoked_tokens = {token_id: expires_at for token_id, expires_at in self.revoked_tokens.items() if expires_at >= now}
+            self.revoked_tokens[claims.token_id] = claims.expires_at
+
+    def check(self, claims: TokenClaims):
+        if claims.token_id in self.revoked_tokens or claims.issued_at < self.revoked_before.get((claims.role, claims.subject), 0):
+            raise HTTPException(status_code=401, detail="Invalid or expired token", headers={"WWW-Authenticate": "Bearer"})
+        if not claims.is_admin and claims.subject in self.banned_users:
+            raise HTTPException(status_code=403, detail="User is banned")
+
+
+auth_cache = AuthCache()
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+def refresh_auth_cache():
+    with Session(engine) as session:
+        auth_cache.load(session)
+
+async def run_auth_refresher():
+    # 启动时已加载过一次，这里先等待再加载
+    while True:
+        await asyncio.sleep(AUTH_REFRESH_SECONDS)
+        try:
+            await run_in_threadpool(refresh_auth_cache)
+        except Exception:
+            logger.exception("Auth cache refresh failed")
+
+
+def get_token_claims(credentials: Annotated[HTTPAuthorizationCredentials | None, Depends(bearer_scheme)]):
+    if credentials is None:
+        if AUTH_REQUIRED:
+            raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+        return None
+    claims = decode_access_token(credentials.credentials)
+    auth_cache.check(claims)
+    return claims
+
+def get_current_claims(claims: Annotated[TokenClaims | None, Depends(get_token_claims)]):
+    # 无论 AUTH_REQUIRED 是否开启都必须携带令牌
+    if claims is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    return claims
+
+def check_user_access(claims: TokenClaims | None, user_id: int):
+    # 未携带令牌（AUTH_REQUIRED 关闭）时放行；携带时只能访问本人数据，管理员不受限制
+    if claims is not None and not claims.is_admin and claims.subject != user_id:
+        raise HTTPException(status_code=403, detail="Permission denied")
+
+def check_admin_access(claims: TokenClaims | None):
+    # 管理接口不受 AUTH_REQUIRED 影响，必须携带管理员令牌
+    if claims is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    if not claims.is_admin:
+        raise HTTPException(status_code=403, detail="Permission denied")
+
+claimsDepends = Annotated[TokenClaims | None, Depends(get_token_claims)]
+currentClaimsDepends = Annotated[TokenClaims, Depends(get_current_claims)]
@@ -0,0 +1,247 @@
+import sys
+import random
+import argparse
+from datetime import datetime, date, time, timedelta
+from sqlalchemy import bindparam
+from sqlmodel import SQLModel, Session, select, insert, update, literal
+from sql.database import engine, insert_returning_ids
+from sql.migrations import run_migrations
+from sql.models import User, Train, Carriage, Seat, Station, TrainRunNum, Route, TrainRun, Ticket, TicketSlot, Order
+from sql.models import TicketSlotStatus, OrderStatus, MAX_ROUTE_STOPS
+from sql.crud import seat_dict, seat_num_dict, segment_mask, ticket_slot_status, rebuild_all_station_pairs
+from sql.fares import fare_engine
+from sql.security import hash_password
+
+# 生成可复现的压测数据：相同的参数和随机种子得到相同的数据库内容
+
+
+class SeedConfig:
+    def __init__(self, seed: int = 0, stations: int = 300, stations_per_city: int = 2, lines: int = 100,
+                 min_stops: int = 4, max_stops: int = 12, days: int = 30, start_date: date | None = None,
+                 users: int = 2000, orders: int = 20000, order_days: int = 30):
+        self.seed = seed
+        self.stations = stations
+        self.stations_per_city = stations_per_city
+        self.lines = lines
+        self.min_stops = min_stops
+        self.max_stops = max_stops
+        self.days = days
+        self.start_date = start_date or date.today()
+        self.users = users
+        self.orders = orders
+        # 订单创建时间分布在此前的若干天内
+        self.order_days = order_days
+
+
+# 每种列车的车厢编组：(车厢类型, 座位排数)
+train_formations = {
+    "fast": [("business", 8), ("first_class", 10), ("second_class", 12), ("second_class", 16)],
+    "slow": [("first_class", 12), ("second_class", 16), ("second_class", 16)],
+}
+
+
+def seed_stations(config: SeedConfig, session: Session):
+    rows = [{"name": f"S{i:04d}", "city": f"C{i // config.stations_per_city:04d}"} for i in range(config.stations)]
+    ids = insert_returning_ids(session, Station, rows)
+    return [(station_id, row["name"]) for station_id, row in zip(ids, rows)]
+
+def seed_lines(config: SeedConfig, rng: random.Random, station_ids: list[int], session: Session):
+    line_ids = insert_returning_ids(session, TrainRunNum, [{"name": f"G{i + 1}"} for i in range(config.lines)])
+    routes = []
+    for line_id in line_ids:
+        stops = rng.sample(station_ids, rng.randint(config.min_stops, min(config.max_stops, len(station_ids))))
+        segments = [rng.randint(20, 60) for _ in stops[1:]]
+        dwells = [rng.randint(2, 5) for _ in stops]
+        # 线路当天跑完，不跨越午夜
+        latest_start = 23 * 60 - sum(segments) - sum(dwells)
+        minutes = rng.randint(6 * 60, max(6 * 60, latest_start))
+        kilometers = 0
+        for sequence, (station_id, dwell) in enumerate(zip(stops, dwells), 1):
+            if sequence > 1:
+                minutes += segments[sequence - 2]
+                kilometers += segments[sequence - 2] * rng.randint(2, 5)
+            arrival = time(minutes // 60, minutes % 60)
+            minutes += dwell
+            departure = time(minutes // 60, minutes % 60)
+            routes.append({
+                "train_run_num_id": line_id, "station_id": station_id, "arrival_time": arrival,
+                "departure_time": departure, "sequence": sequence, "kilometers": kilometers,
+            })
+    session.execute(insert(Route), routes)
+    return line_ids
+
+def seed_trains(count: int, rng: random.Random, session: Session):
+    train_types = [rng.choice(list(train_formations)) for _ in range(count)]
+    train_ids = insert_returning_ids(session, Train, [{"type": train_type, "valid": True} for train_type in train_types])
+    carriages = [
+        {"train_id": train_id, "num": num, "type": carriage_type}
+        for train_id, train_type in zip(train_ids, train_types)
+        for num, (carriage_type, _) in enumerate(train_formations[train_type], 1)
+    ]
+    carriage_ids = insert_returning_ids(session, Carriage, carriages)
+    seat_rows = [rows for train_type in train_types for _, rows in train_formations[train_type]]
+    seats = [
+        {"carriage_id": carriage_id, "seat_num": f"{i + 1}{seat_num_dict[carriage['type']][j]}"}
+        for carriage_id, carriage, rows in zip(carriage_ids, carriages, seat_rows)
+        for i in range(rows)
+        for j in range(seat_dict[carriage["type"]])
+    ]
+    session.execute(insert(Seat), seats)
+    return train_ids
+
+def seed_train_runs(config: SeedConfig, line_ids: list[int], train_ids: list[int], session: Session):
+    # 每条线路固定使用一列车，每天开行一次并已开售
+    rows = [
+        {"train_id": train_id, "train_run_num_id": line_id, "running_date": config.start_date + timedelta(days=day), "locked": True}
+        for day in range(config.days)
+        for line_id, train_id in zip(line_ids, train_ids)
+    ]
+    train_run_ids = insert_returning_ids(session, TrainRun, rows)
+    # 一条 INSERT ... SELECT 为所有车次生成空票位
+    session.execute(
+        insert(TicketSlot).from_select(
+            ["train_run_id", "seat_id", "status", "occupancy"],
+            select(TrainRun.id, Seat.id, ticket_slot_status(TicketSlotStatus.empty), literal(0))
+            .join(Carriage, Carriage.train_id == TrainRun.train_id)
+            .join(Seat, Seat.carriage_id == Carriage.id)
+            .order_by(TrainRun.id, Carriage.num, Seat.id)
+        )
+    )
+    return train_run_ids
+
+def seed_users(config: SeedConfig, session: Session):
+    # 哈希计算较慢，所有用户共用同一个密码的哈希，密码均为 password
+    password = hash_password("password")
+    rows = [{"name": f"user{i:06d}", "telephone": f"1{i:010d}", "password": password} for i in range(config.users)]
+    return insert_returning_ids(session, User, rows)
+
+def seed_orders(config: SeedConfig, rng: random.Random, user_ids: list[int], train_run_ids: list[int], session: Session):
+    if not user_ids or not train_run_ids:
+        return 0
+    train_runs = {
+        train_run_id: (train_run_num_id, train_type)
+        for train_run_id, train_run_num_id, train_type in session.exec(
+            select(TrainRun.id, TrainRun.train_run_num_id, Train.type).join(Train, TrainRun.train_id == Train.id)
+        ).all()
+    }
+    now = datetime.now()
+    tickets, orders = [], []
+    slots: dict[int, list] = {}
+    occupancies: dict[int, int] = {}
+    for _ in range(config.orders):
+        train_run_id = rng.choice(train_run_ids)
+        train_run_num_id, train_type = train_runs[train_run_id]
+        kilometers = fare_engine.kilometers(train_run_num_id, session)
+        start_seq = rng.randint(1, len(kilometers) - 1)
+        end_seq = rng.randint(start_seq + 1, len(kilometers))
+        mask = segment_mask(start_seq, end_seq)
+        run_slots = slots.get(train_run_id)
+        if run_slots is None:
+            run_slots = slots[train_run_id] = session.exec(
+                select(TicketSlot.id, Carriage.type)
+                .join(Seat, TicketSlot.seat_id == Seat.id)
+                .join(Carriage, Seat.carriage_id == Carriage.id)
+                .where(TicketSlot.train_run_id == train_run_id)
+                .order_by(Carriage.num, Seat.id)
+            ).all()
+        slot = next((slot for slot in run_slots if occupancies.get(slot[0], 0) & mask == 0), None)
+        if slot is None:
+            continue
+        slot_id, carriage_type = slot
+        # 已取消的订单不占座
+        status = rng.choices([OrderStatus.completed, OrderStatus.pending, OrderStatus.cancelled], [6, 2, 2])[0]
+        if status != OrderStatus.cancelled:
+            occupancies[slot_id] = occupancies.get(slot_id, 0) | mask
+        # 待支付订单放在最近几分钟内，避免启动后立即被超时清理
+        window = 600 if status == OrderStatus.pending else config.order_days * 24 * 3600
+        created_at = now - timedelta(seconds=rng.randint(0, window))
+        tickets.append({
+            "ticket_slot_id": slot_id, "start_sequence": start_seq, "end_sequence": end_seq, "occupancy": mask,
+            "price": fare_engine.price(train_type, carriage_type, kilometers[end_seq - 1] - kilometers[start_seq - 1]),
+            "sold": status == OrderStatus.completed,
+        })
+        orders.append({
+            "user_id": rng.choice(user_ids), "status": status, "created_at": created_at,
+            "completed_at": created_at + timedelta(minutes=5) if status == OrderStatus.completed else None,
+            "cancelled_at": created_at + timedelta(minutes=10) if status == OrderStatus.cancelled else None,
+        })
+
+    ticket_ids = insert_returning_ids(session, Ticket, tickets)
+    for order, ticket_id in zip(orders, ticket_ids):
+        order["ticket_id"] = ticket_id
+    if orders:
+        session.execute(insert(Order), orders)
+
+    full_masks = {train_run_id: segment_mask(1, len(fare_engine.kilometers(train_run_num_id, session)))
+                  for train_run_id, (train_run_num_id, _) in train_runs.items()}
+    slot_runs = {slot[0]: train_run_id for train_run_id, run_slots in slots.items() for slot in run_slots}
+    if occupancies:
+        session.connection().execute(
+            update(TicketSlot)
+            .where(TicketSlot.id == bindparam("slot_id"))
+            .values(occupancy=bindparam("slot_occupancy"), status=bindparam("slot_status")),
+            [
+                {
+                    "slot_id": slot_id, "slot_occupancy": occupancy,
+                    "slot_status": TicketSlotStatus.full if occupancy & full_masks[slot_runs[slot_id]] == full_masks[slot_runs[slot_id]] else TicketSlotStatus.remaining,
+                }
+                for slot_id, occupancy in occupancies.items()
+            ]
+        )
+    return len(orders)
+
+def seed(config: SeedConfig, bind=engine):
+    rng = random.Random(config.seed)
+    SQLModel.metadata.create_all(bind)
+    run_migrations(bind)
+    with Session(bind) as session:
+        if session.exec(select(Station.id)).first() is not None:
+            raise ValueError("database already contains stations, seed an empty database")
+        stations = seed_stations(config, session)
+        line_ids = seed_lines(config, rng, [station_id for station_id, _ in stations], session)
+        train_ids = seed_trains(len(line_ids), rng, session)
+        train_run_ids = seed_train_runs(config, line_ids, train_ids, session)
+        user_ids = seed_users(config, session)
+        session.flush()
+        orders = seed_orders(config, rng, user_ids, train_run_ids, session)
+        session.commit()
+        rebuild_all_station_pairs(session)
+    return {
+        "stations": len(stations), "train_run_nums": len(line_ids), "trains": len(train_ids),
+        "train_runs": len(train_run_ids), "users": len(user_ids), "orders": orders,
+    }
+
+def main():
+    defaults = SeedConfig()
+    parser = argparse.ArgumentParser(description="Populate an empty database with a reproducible synthetic dataset")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--stations", type=int, default=defaults.stations)
+    parser.add_argument("--stations-per-city", type=int, default=defaults.stations_per_city)
+    parser.add_argument("--lines", type=int, default=defaults.lines, help="number of train run numbers")
+    parser.add_argument("--min-stops", type=int, default=defaults.min_stops)
+    parser.add_argument("--max-stops", type=int, default=defaults.max_stops)
+    parser.add_argument("--days", type=int, default=defaults.days, help="days of train runs starting at --start-date")
+    parser.add_argument("--start-date", type=date.fromisoformat, default=defaults.start_date)
+    parser.add_argument("--users", type=int, default=defaults.users)
+    parser.add_argument("--orders", type=int, default=defaults.orders)
+    args = parser.parse_args()
+    if args.min_stops < 2 or args.max_stops < args.min_stops or args.stations < args.max_stops:
+        parser.error("need 2 <= --min-stops <= --max-stops <= --stations")
+    if args.max_stops > MAX_ROUTE_STOPS:
+        parser.error(f"--max-stops must be at most {MAX_ROUTE_STOPS}")
+
+    config = SeedConfig(
+        seed=args.seed, stations=args.stations, stations_per_city=args.stations_per_city, lines=args.lines,
+        min_stops=args.min_stops, max_stops=args.max_stops, days=args.days, start_date=args.start_date,
+        users=args.users, orders=args.orders,
+    )
+    started = datetime.now()
+    try:
+        counts = seed(config)
+    except ValueError as exception:
+        print(exception)
+        sys.exit(1)
+    print(", ".join(f"{name}: {count}" for name, count in counts.items()), f"in {(datetime.now() - started).total_seconds():.1f}s")
+
+if __name__ == "__main__":
+    main()
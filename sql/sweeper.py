@@ -0,0 +1,38 @@
+import os
+import asyncio
+import logging
+from datetime import timedelta
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import Session
+from sql.database import engine
+from sql.crud import expire_pending_orders
+
+# 待支付订单的保留时间，超时后自动取消并释放座位
+ORDER_HOLD_MINUTES = float(os.environ.get("ORDER_HOLD_MINUTES", 30))
+ORDER_SWEEP_INTERVAL_SECONDS = float(os.environ.get("ORDER_SWEEP_INTERVAL_SECONDS", 60))
+ORDER_SWEEP_BATCH_SIZE = int(os.environ.get("ORDER_SWEEP_BATCH_SIZE", 200))
+
+logger = logging.getLogger(__name__)
+
+
+def sweep_expired_orders():
+    hold = timedelta(minutes=ORDER_HOLD_MINUTES)
+    total = 0
+    with Session(engine) as session:
+        while True:
+            expired = expire_pending_orders(hold, ORDER_SWEEP_BATCH_SIZE, session)
+            total += expired
+            if expired < ORDER_SWEEP_BATCH_SIZE:
+                break
+    if total:
+        logger.info("Expired %d pending orders", total)
+    return total
+
+
+async def run_order_sweeper():
+    while True:
+        try:
+            await run_in_threadpool(sweep_expired_orders)
+        except Exception:
+            logger.exception("Pending order sweep failed")
+        await asyncio.sleep(ORDER_SWEEP_INTERVAL_SECONDS)
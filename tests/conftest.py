@@ -0,0 +1,97 @@
+import os
+import itertools
+import tempfile
+from datetime import date, time, timedelta
+
+# 测试使用临时数据库文件，必须在导入 sql 模块之前设置；子进程继承环境变量，使用同一个数据库
+if "TEST_DATABASE_DIR" not in os.environ:
+    os.environ["TEST_DATABASE_DIR"] = tempfile.mkdtemp(prefix="train-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(os.environ['TEST_DATABASE_DIR'], 'test.db')}"
+os.environ.setdefault("PASSWORD_HASH_ITERATIONS", "1000")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import SQLModel, Session
+from sql.database import engine
+from sql.migrations import run_migrations
+from sql.schemas import (
+    UserCreate, StationCreate, TrainCreate, CarriageCreate, TrainUpdate, RouteCreate,
+    TrainRunNumCreate, TrainRunCreate, TrainRunUpdate,
+)
+from sql import crud
+
+# 每次构造车次都使用新的名称，测试之间共用同一个数据库而互不影响
+names = itertools.count(1)
+
+
+class TrainRunFixture:
+    def __init__(self, train_run_id: int, train_run_num_id: int, route_ids: list[int], station_names: list[str], seats: int, running_date: date):
+        self.train_run_id = train_run_id
+        self.train_run_num_id = train_run_num_id
+        self.route_ids = route_ids
+        self.station_names = station_names
+        self.seats = seats
+        self.running_date = running_date
+
+    def order(self, start_seq: int, end_seq: int, **fields):
+        return {
+            "total_routes": len(self.route_ids),
+            "train_run_id": self.train_run_id, "train_run_num_id": self.train_run_num_id,
+            "start_route_id": self.route_ids[start_seq - 1], "start_seq": start_seq,
+            "end_route_id": self.route_ids[end_seq - 1], "end_seq": end_seq,
+            **fields,
+        }
+
+
+def create_train_run(session: Session, stops: int = 4, locked: bool = True, running_date: date | None = None):
+    n = next(names)
+    station_names = [f"T{n}-S{i}" for i in range(1, stops + 1)]
+    for name in station_names:
+        crud.add_station(StationCreate(name=name, city=name), session)
+    train = crud.add_train(TrainCreate(type="fast", carriages=[
+        CarriageCreate(num=1, type="business", seat_rows=8),
+        CarriageCreate(num=2, type="first_class", seat_rows=10),
+    ]), session)
+    crud.modify_train(train.id, TrainUpdate(valid=True), session)
+    train_run_num = crud.add_train_run_num(TrainRunNumCreate(name=f"T{n}", routes=[
+        RouteCreate(station_name=name, sequence=i, kilometers=(i - 1) * 100,
+                    arrival_time=time(8 + i * 10 // 60, i * 10 % 60), departure_time=time(8 + (i * 10 + 5) // 60, (i * 10 + 5) % 60))
+        for i, name in enumerate(station_names, 1)
+    ]), session)
+    running_date = running_date or date.today() + timedelta(days=n)
+    train_run = crud.add_train_run(TrainRunCreate(running_date=running_date, train_id=train.id, train_run_num_id=train_run_num.id), session)
+    if locked:
+        crud.modify_train_run(train_run.id, TrainRunUpdate(locked=True), session)
+    route_ids = [route.id for route in sorted(train_run_num.routes, key=lambda route: route.sequence)]
+    seats = sum(len(carriage.seats) for carriage in train.carriages)
+    return TrainRunFixture(train_run.id, train_run_num.id, route_ids, station_names, seats, running_date)
+
+def create_users(session: Session, count: int):
+    n = next(names)
+    return [
+        crud.add_user(UserCreate(name=f"u{n}-{i}", telephone=f"{n:05d}{i:06d}", password="password"), session).id
+        for i in range(count)
+    ]
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    SQLModel.metadata.create_all(engine)
+    run_migrations(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def session(database):
+    with Session(database) as session:
+        yield session
+
+@pytest.fixture
+def train_run(session):
+    return create_train_run(session)
+
+@pytest.fixture(scope="session")
+def client(database):
+    # 不进入 lifespan，不启动后台任务
+    from main import app
+    return TestClient(app)
@@ -0,0 +1,34 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+from sql.database import engine
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements: list[str] = []
+        self.parameters: list = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+        self.parameters.append(parameters)
+
+
+@contextmanager
+def count_queries(bind=engine):
+    # 统计代码块内发出的 SQL 语句数，用于检查接口是否存在逐条懒加载
+    counter = QueryCounter()
+    event.listen(bind, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(bind, "before_cursor_execute", counter)
+
+@contextmanager
+def assert_max_queries(limit: int, bind=engine):
+    with count_queries(bind) as counter:
+        yield counter
+    assert counter.count <= limit, f"{counter.count} queries executed, expected at most {limit}:\n" + "\n".join(counter.statements)
@@ -0,0 +1,98 @@
+import random
+import threading
+import multiprocessing
+from fastapi import HTTPException
+from sqlmodel import Session, select
+from sql.database import engine
+from sql.models import Ticket, TicketSlot, Order, OrderStatus
+from sql.schemas import OrderCreate, OrderBatchCreate
+from sql.crud import add_order, add_orders, segment_mask
+from sql.inventory import seat_inventory
+from conftest import create_users
+
+# 多个线程（共用同一份内存库存）和多个进程（各自持有库存，只靠数据库的条件更新互斥）同时订同一车次，
+# 检查同一座位上没有区段重叠的有效车票，且票位的占用位图与车票一致
+
+WORKERS = 4
+BOOKINGS_PER_WORKER = 40
+
+
+def random_segment(rng: random.Random, stops: int):
+    start_seq = rng.randint(1, stops - 1)
+    return start_seq, rng.randint(start_seq + 1, stops)
+
+def book(train_run, user_ids: list[int], seed: int, bookings: int):
+    # 返回 (成功数, 各状态码的拒绝数)
+    rng = random.Random(seed)
+    booked, rejected = 0, {}
+    with Session(engine) as session:
+        for _ in range(bookings):
+            start_seq, end_seq = random_segment(rng, len(train_run.route_ids))
+            try:
+                if rng.random() < 0.2:
+                    add_orders(OrderBatchCreate(**train_run.order(start_seq, end_seq, user_ids=rng.sample(user_ids, 2))), session)
+                else:
+                    add_order(OrderCreate(**train_run.order(start_seq, end_seq, user_id=rng.choice(user_ids))), session)
+                booked += 1
+            except HTTPException as exception:
+                session.rollback()
+                rejected[exception.status_code] = rejected.get(exception.status_code, 0) + 1
+    return booked, rejected
+
+def book_in_process(train_run, user_ids: list[int], seed: int, bookings: int):
+    # 子进程重新导入模块，内存库存为空，从数据库加载
+    return book(train_run, user_ids, seed, bookings)
+
+def assert_no_overlapping_tickets(train_run_id: int, session: Session):
+    rows = session.exec(
+        select(Ticket.ticket_slot_id, Ticket.start_sequence, Ticket.end_sequence)
+        .join(Order, Order.ticket_id == Ticket.id)
+        .join(TicketSlot, Ticket.ticket_slot_id == TicketSlot.id)
+        .where(TicketSlot.train_run_id == train_run_id, Order.status != OrderStatus.cancelled)
+    ).all()
+    occupied: dict[int, int] = {}
+    for slot_id, start_seq, end_seq in rows:
+        mask = segment_mask(start_seq, end_seq)
+        assert occupied.get(slot_id, 0) & mask == 0, f"overlapping tickets on ticket slot {slot_id}"
+        occupied[slot_id] = occupied.get(slot_id, 0) | mask
+    occupancies = dict(session.exec(select(TicketSlot.id, TicketSlot.occupancy).where(TicketSlot.train_run_id == train_run_id)).all())
+    for slot_id, occupancy in occupancies.items():
+        assert occupancy == occupied.get(slot_id, 0), f"ticket slot {slot_id} occupancy does not match its tickets"
+    return len(rows)
+
+def assert_results(results: list, tickets: int):
+    booked = 0
+    for worker_booked, rejected in results:
+        booked += worker_booked
+        # 座位不足和重试耗尽是正常拒绝，其他状态码说明出错
+        assert set(rejected) <= {400, 409}, rejected
+    assert booked > 0
+    assert tickets >= booked
+
+
+def test_threads_share_inventory(session, train_run):
+    user_ids = create_users(session, 8)
+    results = [None] * WORKERS
+
+    def worker(i: int):
+        results[i] = book(train_run, user_ids, i, BOOKINGS_PER_WORKER)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(WORKERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert_results(results, assert_no_overlapping_tickets(train_run.train_run_id, session))
+
+def test_processes_with_separate_inventories(session, train_run):
+    user_ids = create_users(session, 8)
+    # 本进程先加载库存，再由其他进程订票，内存中的库存随之过期
+    with seat_inventory.run(train_run.train_run_id, session):
+        pass
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(WORKERS) as pool:
+        results = pool.starmap(book_in_process, [(train_run, user_ids, seed, BOOKINGS_PER_WORKER) for seed in range(WORKERS)])
+    results.append(book(train_run, user_ids, WORKERS, BOOKINGS_PER_WORKER))
+
+    assert_results(results, assert_no_overlapping_tickets(train_run.train_run_id, session))
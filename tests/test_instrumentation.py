@@ -0,0 +1,37 @@
+import sqlite3
+import threading
+import time
+from sqlalchemy import text
+from sql.database import build_engine
+from sql.instrumentation import instrument
+from sql.metrics import registry, db_write_duration
+
+HOLD_SECONDS = 0.3
+
+
+def test_blocked_writes_are_timed(tmp_path):
+    path = tmp_path / "locks.db"
+    engine = build_engine(f"sqlite:///{path}")
+    instrument(engine)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE counter (value INTEGER)"))
+        connection.execute(text("INSERT INTO counter VALUES (0)"))
+    observed = db_write_duration.values.get(("update",), [0.0, 0])[-2:]
+
+    # 另一个连接持有写锁一段时间，期间的更新语句阻塞等待
+    holder = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    holder.execute("BEGIN IMMEDIATE")
+    releaser = threading.Timer(HOLD_SECONDS, holder.execute, ("COMMIT",))
+    releaser.start()
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE counter SET value = value + 1"))
+    assert time.perf_counter() - started >= HOLD_SECONDS
+    releaser.join()
+    holder.close()
+    engine.dispose()
+
+    seconds, count = db_write_duration.values[("update",)][-2:]
+    assert count == observed[1] + 1
+    assert seconds - observed[0] >= HOLD_SECONDS * 0.9
+    assert 'db_write_duration_seconds_count{statement="update"}' in registry.render()
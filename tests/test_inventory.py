@@ -0,0 +1,78 @@
+import threading
+import time
+import pytest
+from fastapi import HTTPException
+from sqlmodel import Session, update
+from sql.database import engine
+from sql import inventory
+from sql.models import TicketSlot, TicketSlotStatus
+from sql.schemas import OrderCreate
+from sql.crud import add_order, segment_mask, set_train_run_finished
+from sql.inventory import seat_inventory
+from conftest import create_users, create_train_run
+
+# 其他进程直接修改数据库中的票位，模拟多 worker 部署时本进程的内存库存过期
+
+
+def set_all_slots(train_run_id: int, occupancy: int, status: TicketSlotStatus, session):
+    session.exec(update(TicketSlot).where(TicketSlot.train_run_id == train_run_id).values(occupancy=occupancy, status=status))
+    session.commit()
+
+def test_booking_rechecks_database_before_rejecting(session, train_run):
+    user_id, = create_users(session, 1)
+    full_mask = segment_mask(1, len(train_run.route_ids))
+    order = OrderCreate(**train_run.order(1, 2, user_id=user_id))
+
+    with seat_inventory.run(train_run.train_run_id, session):
+        pass
+    # 其他进程售完全部座位
+    set_all_slots(train_run.train_run_id, full_mask, TicketSlotStatus.full, session)
+    with pytest.raises(HTTPException) as exception:
+        add_order(order, session)
+    assert exception.value.status_code == 400
+    session.rollback()
+
+    # 其他进程取消订单释放座位，本进程内存中仍为售完
+    set_all_slots(train_run.train_run_id, 0, TicketSlotStatus.empty, session)
+    assert add_order(order, session).ticket.start_sequence == 1
+
+def test_availability_expires(session, train_run, monkeypatch):
+    mask = segment_mask(1, len(train_run.route_ids))
+    assert sum(seat_inventory.availability(train_run.train_run_id, mask, session).values()) == train_run.seats
+
+    set_all_slots(train_run.train_run_id, mask, TicketSlotStatus.full, session)
+    assert sum(seat_inventory.availability(train_run.train_run_id, mask, session).values()) == train_run.seats
+    monkeypatch.setattr(inventory, "SEAT_INVENTORY_TTL_SECONDS", 0)
+    assert sum(seat_inventory.availability(train_run.train_run_id, mask, session).values()) == 0
+
+def test_finished_run_drops_lock_and_inventory(session):
+    train_run = create_train_run(session)
+    user_id, = create_users(session, 1)
+    add_order(OrderCreate(**train_run.order(1, 2, user_id=user_id)), session)
+    assert train_run.train_run_id in seat_inventory._runs
+    assert train_run.train_run_id in seat_inventory._locks
+
+    set_train_run_finished(train_run.train_run_id, True, session)
+    assert train_run.train_run_id not in seat_inventory._runs
+    assert train_run.train_run_id not in seat_inventory._locks
+
+def test_lock_kept_while_other_thread_waits(session, train_run):
+    train_run_id = train_run.train_run_id
+    seen = []
+
+    def book():
+        with Session(engine) as other, seat_inventory.run(train_run_id, other):
+            seen.append(seat_inventory._locks.get(train_run_id))
+
+    with seat_inventory.run(train_run_id, session):
+        lock = seat_inventory._locks[train_run_id]
+        waiter = threading.Thread(target=book)
+        waiter.start()
+        while seat_inventory._lock_users[train_run_id] < 2:
+            time.sleep(0.01)
+        # 持有锁期间车次被丢弃，仍有线程等待的锁不能删除，否则等待者与后来者会拿到两把不同的锁
+        seat_inventory._runs.pop(train_run_id)
+    waiter.join()
+    assert seen == [lock]
+    seat_inventory.invalidate(train_run_id)
+    assert train_run_id not in seat_inventory._locks
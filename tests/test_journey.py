@@ -0,0 +1,40 @@
+from datetime import date, timedelta
+from sql import journey
+from sql.journey import JourneyPlanner
+
+
+class CountingPlanner(JourneyPlanner):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.loads: list[date] = []
+
+    def _load(self, running_date: date, session):
+        self.loads.append(running_date)
+        return object()
+
+
+def test_timetables_are_bounded():
+    planner = CountingPlanner(maxsize=2, ttl=60)
+    days = [date.today() + timedelta(days=i) for i in range(3)]
+    first = planner.timetable(days[0], None)
+    assert planner.timetable(days[0], None) is first
+    planner.timetable(days[1], None)
+    # 最近使用过的日期保留，最久未使用的被淘汰
+    planner.timetable(days[0], None)
+    planner.timetable(days[2], None)
+    assert planner.timetable(days[0], None) is first
+    planner.timetable(days[1], None)
+    assert planner.loads == [days[0], days[1], days[2], days[1]]
+    assert planner.stats()["size"] == 2
+    assert planner.stats()["evictions"] == 2
+
+def test_timetables_expire(monkeypatch):
+    planner = CountingPlanner(maxsize=2, ttl=60)
+    now = [1000.0]
+    monkeypatch.setattr(journey.time, "monotonic", lambda: now[0])
+    first = planner.timetable(date.today(), None)
+    now[0] += 59
+    assert planner.timetable(date.today(), None) is first
+    now[0] += 2
+    assert planner.timetable(date.today(), None) is not first
+    assert planner.stats()["expirations"] == 1
@@ -0,0 +1,58 @@
+from datetime import date, datetime, time
+from sqlmodel import SQLModel, select, insert
+from sql.database import build_engine
+from sql.migrations import add_ticket_slot_occupancy
+from sql.models import Route, TrainRun, TicketSlot, Ticket, Order, TicketSlotStatus, OrderStatus
+
+
+def test_backfill_occupancy_from_old_schema(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as connection:
+        # 还原为没有 occupancy 列的旧表结构，线路 4 站 3 段，整条线路的位图为 0b111
+        connection.exec_driver_sql("ALTER TABLE ticket_slot DROP COLUMN occupancy")
+        connection.execute(insert(Route), [
+            {"train_run_num_id": 1, "station_id": i, "sequence": i, "kilometers": i * 100,
+             "arrival_time": time(8 + i), "departure_time": time(8 + i)}
+            for i in range(1, 5)
+        ])
+        connection.execute(insert(TrainRun).values(id=1, train_id=1, train_run_num_id=1, running_date=date.today(), locked=True))
+        # 旧表没有 occupancy 列，不能使用带默认值的模型插入
+        connection.exec_driver_sql("INSERT INTO ticket_slot (id, train_run_id, seat_id, status) VALUES (?, 1, ?, ?)", [
+            # 普通车票占用第 1-3 站
+            (1, 1, TicketSlotStatus.remaining.name),
+            # 直达票只记录了第 2-3 站，但占用整个座位
+            (2, 2, TicketSlotStatus.full.name),
+            # 订单已取消但旧版本没有释放座位，回填后为空闲
+            (3, 3, TicketSlotStatus.full.name),
+            # 订单已取消，座位状态仍为 remaining
+            (4, 4, TicketSlotStatus.remaining.name),
+            (5, 5, TicketSlotStatus.empty.name),
+        ])
+        connection.execute(insert(Ticket), [
+            {"id": 1, "ticket_slot_id": 1, "price": 1, "start_sequence": 1, "end_sequence": 3},
+            {"id": 2, "ticket_slot_id": 2, "price": 1, "start_sequence": 2, "end_sequence": 3},
+            {"id": 3, "ticket_slot_id": 3, "price": 1, "start_sequence": 1, "end_sequence": 2},
+            {"id": 4, "ticket_slot_id": 4, "price": 1, "start_sequence": 3, "end_sequence": 4},
+        ])
+        connection.execute(insert(Order), [
+            {"ticket_id": 1, "user_id": 1, "status": OrderStatus.completed, "created_at": datetime.now()},
+            {"ticket_id": 2, "user_id": 1, "status": OrderStatus.pending, "created_at": datetime.now()},
+            {"ticket_id": 3, "user_id": 1, "status": OrderStatus.cancelled, "created_at": datetime.now()},
+            {"ticket_id": 4, "user_id": 1, "status": OrderStatus.cancelled, "created_at": datetime.now()},
+        ])
+
+    with engine.begin() as connection:
+        add_ticket_slot_occupancy(connection)
+        slots = {slot_id: (occupancy, status) for slot_id, occupancy, status in connection.execute(
+            select(TicketSlot.id, TicketSlot.occupancy, TicketSlot.status)
+        ).all()}
+    engine.dispose()
+
+    assert slots == {
+        1: (0b011, TicketSlotStatus.remaining),
+        2: (0b111, TicketSlotStatus.full),
+        3: (0, TicketSlotStatus.empty),
+        4: (0, TicketSlotStatus.empty),
+        5: (0, TicketSlotStatus.empty),
+    }
@@ -0,0 +1,115 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import pytest
+from fastapi import HTTPException
+from sqlmodel import Session, select
+from sql.database import engine
+from sql.models import Order, TicketSlot, TicketSlotStatus, OrderStatus, MAX_GROUP_SIZE
+from pydantic import ValidationError
+from sql.schemas import OrderCreate, OrderBatchCreate
+from sql.crud import add_order, cancel_order, remove_order, complete_order, expire_pending_orders, get_orders, get_orders_by_user
+from sql.security import create_access_token
+from sql import crud, pagination
+from sql.inventory import seat_inventory
+from conftest import create_users
+
+
+def slot_state(order, session):
+    return session.exec(
+        select(TicketSlot.occupancy, TicketSlot.status).where(TicketSlot.id == order.ticket.ticket_slot_id)
+    ).one()
+
+def book_through(train_run, session):
+    user_id, = create_users(session, 1)
+    # 直达票只乘坐第 1-2 站，但占用整条线路
+    order = add_order(OrderCreate(**train_run.order(1, 2, user_id=user_id, is_through=True)), session)
+    assert slot_state(order, session) == (0b111, TicketSlotStatus.full)
+    return order
+
+
+def test_cancel_through_ticket_releases_whole_seat(session, train_run):
+    order = book_through(train_run, session)
+    cancel_order(order.id, session)
+    assert slot_state(order, session) == (0, TicketSlotStatus.empty)
+
+def test_expire_through_ticket_releases_whole_seat(session, train_run):
+    order = book_through(train_run, session)
+    # 保留时长为负数时所有待支付订单都已超时
+    assert expire_pending_orders(timedelta(minutes=-1), 1000, session) >= 1
+    session.refresh(order)
+    assert slot_state(order, session) == (0, TicketSlotStatus.empty)
+
+def test_remove_through_ticket_releases_whole_seat(session, train_run):
+    order = book_through(train_run, session)
+    slot_id = order.ticket.ticket_slot_id
+    remove_order(order.id, session)
+    assert session.exec(select(TicketSlot.occupancy, TicketSlot.status).where(TicketSlot.id == slot_id)).one() == (0, TicketSlotStatus.empty)
+
+
+def test_complete_after_expire_is_rejected(session, train_run):
+    user_id, = create_users(session, 1)
+    order = add_order(OrderCreate(**train_run.order(1, 3, user_id=user_id)), session)
+    # 超时清理在另一个会话中取消了订单，本会话中的订单状态仍是过时的 pending
+    with Session(engine) as other:
+        expire_pending_orders(timedelta(minutes=-1), 1000, other)
+    assert order.status == OrderStatus.pending
+    with pytest.raises(HTTPException) as exception:
+        complete_order(order.id, session)
+    assert exception.value.status_code == 400
+    session.refresh(order)
+    assert order.status == OrderStatus.cancelled
+    assert not order.ticket.sold
+    assert slot_state(order, session) == (0, TicketSlotStatus.empty)
+
+def test_expire_skips_order_completed_meanwhile(session, train_run, monkeypatch):
+    user_id, = create_users(session, 1)
+    order = add_order(OrderCreate(**train_run.order(1, 3, user_id=user_id)), session)
+    runs = seat_inventory.runs
+
+    @contextmanager
+    def complete_first(train_run_ids, session):
+        # 超时清理选出候选订单之后、取消之前，支付请求完成了订单
+        with Session(engine) as other:
+            complete_order(order.id, other)
+        with runs(train_run_ids, session) as run_inventories:
+            yield run_inventories
+
+    monkeypatch.setattr(seat_inventory, "runs", complete_first)
+    with Session(engine) as other:
+        expire_pending_orders(timedelta(minutes=-1), 1000, other)
+    session.refresh(order)
+    assert order.status == OrderStatus.completed
+    assert slot_state(order, session) == (0b11, TicketSlotStatus.remaining)
+
+@pytest.mark.parametrize("path", ["/orders/", "/orders/user/{user_id}"])
+@pytest.mark.parametrize("limit", [0, pagination.MAX_PAGE_SIZE + 1])
+def test_order_list_limit_bounds(client, session, path, limit):
+    user_id, = create_users(session, 1)
+    token = create_access_token(0, "admin")["access_token"]
+    response = client.get(path.format(user_id=user_id), params={"limit": limit}, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 422
+
+def test_page_size_is_capped(session, train_run, monkeypatch):
+    user_id, = create_users(session, 1)
+    for start_seq, end_seq in [(1, 2), (2, 3), (3, 4)]:
+        add_order(OrderCreate(**train_run.order(start_seq, end_seq, user_id=user_id)), session)
+    monkeypatch.setattr(pagination, "MAX_PAGE_SIZE", 2)
+    monkeypatch.setattr(crud, "MAX_PAGE_SIZE", 2)
+    orders, next_cursor = get_orders(0, 1000, session)
+    assert len(orders) == 2 and next_cursor is not None
+    orders, next_cursor = get_orders_by_user(user_id, 1000, session)
+    assert len(orders) == 2 and next_cursor is not None
+
+def test_cancel_order_without_ticket(session):
+    user_id, = create_users(session, 1)
+    order = Order(user_id=user_id, status=OrderStatus.pending, created_at=datetime.now())
+    session.add(order)
+    session.commit()
+    assert cancel_order(order.id, session).status == OrderStatus.cancelled
+    assert cancel_order(order.id, session) == {"message": "Order already cancelled"}
+
+def test_group_size_is_capped(session, train_run):
+    user_ids = create_users(session, MAX_GROUP_SIZE + 1)
+    OrderBatchCreate(**train_run.order(1, 2, user_ids=user_ids[:MAX_GROUP_SIZE]))
+    with pytest.raises(ValidationError):
+        OrderBatchCreate(**train_run.order(1, 2, user_ids=user_ids))
@@ -0,0 +1,54 @@
+import pytest
+from sql.cache import search_cache
+from sql.schemas import OrderCreate
+from sql.crud import add_order
+from sql.security import create_access_token
+from conftest import create_users
+from queries import assert_max_queries
+
+# 接口的 SQL 条数上限，超过说明出现了逐条懒加载（N+1）
+
+
+@pytest.fixture
+def orders(session, train_run):
+    user_id, = create_users(session, 1)
+    order_ids = [
+        add_order(OrderCreate(**train_run.order(start_seq, end_seq, user_id=user_id)), session).id
+        for start_seq, end_seq in [(1, 2), (2, 4), (1, 3)]
+    ]
+    return user_id, order_ids
+
+
+def bearer(subject: int, role: str):
+    return {"Authorization": f"Bearer {create_access_token(subject, role)['access_token']}"}
+
+
+@pytest.mark.parametrize("path, limit", [
+    ("/orders/{order_id}", 1),
+    ("/orders/user/{user_id}", 1),
+    ("/orders/", 1),
+    ("/users/{user_id}", 1),
+    ("/train_runs/{train_run_id}", 1),
+    ("/train_runs/", 1),
+    ("/train_runs/{train_run_id}/availability?start_seq=1&end_seq=3", 1),
+])
+def test_read_endpoints(client, train_run, orders, path, limit):
+    user_id, order_ids = orders
+    url = path.format(order_id=order_ids[-1], user_id=user_id, train_run_id=train_run.train_run_id)
+    # 管理员令牌不需要查询订单归属，列表接口只允许管理员访问
+    headers = bearer(0, "admin")
+    with assert_max_queries(limit):
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    if url.startswith("/orders/user/"):
+        assert len(response.json()) == len(order_ids)
+
+def test_train_run_search(client, train_run):
+    search_cache.clear()
+    demand = {"running_date": train_run.running_date.isoformat(), "start_station": train_run.station_names[0], "end_station": train_run.station_names[2]}
+    # 车站、候选车次、车次详情各一条
+    with assert_max_queries(3):
+        response = client.post("/train_runs/demand", json=demand)
+    assert [run["id"] for run in response.json()] == [train_run.train_run_id]
+    with assert_max_queries(0):
+        assert client.post("/train_runs/demand", json=demand).json() == response.json()
@@ -0,0 +1,58 @@
+from datetime import timedelta
+import anyio
+from sqlmodel import Session
+from sql.database import engine
+from sql.schemas import UserCreate, UserLogin, OrderCreate, TrainRunDemand, JourneyDemand
+from sql.inventory import seat_inventory
+from sql.cache import search_cache
+from sql.journey import journey_planner
+from sql import crud
+from conftest import create_users
+from queries import count_queries
+
+# 对热点接口实际发出的语句执行 EXPLAIN QUERY PLAN，检查是否有不走索引的全表扫描
+
+
+def query_plan(statement: str, parameters):
+    with engine.connect() as connection:
+        return [row[3] for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()]
+
+def full_scans(counter):
+    scans = []
+    for statement, parameters in zip(counter.statements, counter.parameters):
+        # 批量写入和事务控制语句没有可比较的执行计划；没有条件的语句本就读取整张表（如规划换乘时加载全部车站）
+        if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")) or isinstance(parameters, list):
+            continue
+        if "WHERE" not in statement.upper():
+            continue
+        plan = query_plan(statement, parameters)
+        if any(detail.startswith("SCAN") and "INDEX" not in detail for detail in plan):
+            scans.append(f"{'; '.join(plan)}\n{statement}")
+    return scans
+
+
+def test_hot_queries_use_indexes(session: Session, train_run):
+    user = crud.add_user(UserCreate(name="plan-user", telephone="plan-user", password="password"), session)
+    user_id, = create_users(session, 1)
+    demand = {"running_date": train_run.running_date, "start_station": train_run.station_names[0], "end_station": train_run.station_names[2]}
+    seat_inventory.clear()
+    search_cache.clear()
+    journey_planner.clear()
+
+    with count_queries() as counter:
+        anyio.run(crud.authenticate_user, UserLogin(name=user.name, telephone=user.telephone, password="password"), session)
+        crud.search_train_runs(TrainRunDemand(**demand), session)
+        crud.get_journeys(JourneyDemand(**demand), session)
+        crud.get_train_run_availability(train_run.train_run_id, 1, 3, session)
+        order = crud.add_order(OrderCreate(**train_run.order(1, 3, user_id=user_id)), session)
+        crud.get_order(order.id, session)
+        crud.get_orders_by_user(user_id, 20, session)
+        # 超时清理：保留时长为负数时所有待支付订单都已超时
+        assert crud.expire_pending_orders(timedelta(minutes=-1), 100, session) >= 1
+        crud.remove_order(order.id, session)
+    # 起讫站连接查询和超时订单查询都已覆盖
+    assert any("JOIN station_pair" in statement for statement in counter.statements)
+    assert any('"order".created_at <' in statement for statement in counter.statements)
+
+    scans = full_scans(counter)
+    assert not scans, "full table scans:\n\n" + "\n\n".join(scans)
@@ -0,0 +1,55 @@
+import time
+import pytest
+from fastapi import HTTPException
+from sqlmodel import update
+from sql.models import User
+from sql.crud import get_password_hashes, set_user_ban
+from sql.security import auth_cache, refresh_auth_cache, TokenClaims
+from conftest import create_users
+
+
+def set_banned(user_id: int, banned: bool, session):
+    # 模拟其他进程修改封禁状态，本进程的缓存不会收到通知
+    session.exec(update(User).where(User.id == user_id).values(banned=banned))
+    session.commit()
+
+def test_refresh_picks_up_bans_from_other_workers(session):
+    user_id, = create_users(session, 1)
+    claims = TokenClaims(user_id, "user", time.time(), time.time() + 60, "token")
+    refresh_auth_cache()
+    auth_cache.check(claims)
+
+    set_banned(user_id, True, session)
+    refresh_auth_cache()
+    with pytest.raises(HTTPException) as exception:
+        auth_cache.check(claims)
+    assert exception.value.status_code == 403
+
+    set_banned(user_id, False, session)
+    refresh_auth_cache()
+    auth_cache.check(claims)
+
+
+@pytest.mark.parametrize("path", ["/admin/count?query=users", "/orders/", "/users/"])
+def test_admin_routes_require_token(client, path):
+    assert client.get(path).status_code == 401
+
+def test_banned_user_cannot_skip_token(client, session):
+    response = client.post("/users/create", json={"name": "banned-user", "telephone": "banned-user", "password": "password"})
+    assert response.status_code == 200
+    user_id = response.json()["id"]
+    login = {"name": "banned-user", "telephone": "banned-user", "password": "password"}
+    assert client.post("/users/token", json=login).status_code == 200
+
+    set_user_ban(user_id, True, session)
+    assert client.post("/users/token", json=login).status_code == 403
+    # 不携带令牌也不能绕过封禁访问本人数据
+    assert client.get(f"/users/{user_id}").status_code == 401
+    set_user_ban(user_id, False, session)
+
+def test_password_lookup_releases_connection(session):
+    user_id, = create_users(session, 1)
+    name = session.get(User, user_id).name
+    assert [account_id for account_id, _ in get_password_hashes(User, name, session)] == [user_id]
+    # 校验密码前已结束事务，哈希计算期间不占用数据库连接
+    assert not session.in_transaction()
@@ -0,0 +1,45 @@
+from datetime import time
+import pytest
+from fastapi import HTTPException
+from sqlmodel import select
+from sql.database import build_engine
+from sql.models import TicketSlot, TicketSlotStatus, MAX_ROUTE_STOPS
+from sql.schemas import OrderCreate, TrainRunNumCreate, RouteCreate
+from sql.crud import add_order, add_train_run_num, segment_mask
+from importer import run_import
+from conftest import create_train_run, create_users
+
+
+def test_longest_route_books_whole_seat(session):
+    train_run = create_train_run(session, stops=MAX_ROUTE_STOPS)
+    user_id, = create_users(session, 1)
+    order = add_order(OrderCreate(**train_run.order(1, MAX_ROUTE_STOPS, user_id=user_id)), session)
+    # 63 段的位图占满 64 位有符号整数的低 63 位
+    assert session.exec(
+        select(TicketSlot.occupancy, TicketSlot.status).where(TicketSlot.id == order.ticket.ticket_slot_id)
+    ).one() == (segment_mask(1, MAX_ROUTE_STOPS), TicketSlotStatus.full)
+
+def test_too_many_stops_rejected(session):
+    routes = [
+        RouteCreate(station_name=f"long-{i}", sequence=i, kilometers=i, arrival_time=time(8), departure_time=time(8))
+        for i in range(1, MAX_ROUTE_STOPS + 2)
+    ]
+    with pytest.raises(HTTPException) as exception:
+        add_train_run_num(TrainRunNumCreate(name="too-long", routes=routes), session)
+    assert exception.value.status_code == 400
+
+def test_importer_rejects_too_many_stops(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'import.db'}")
+    stops = MAX_ROUTE_STOPS + 1
+
+    def load(importer):
+        importer.add_stations((f"stations:{i}", f"S{i}", "") for i in range(stops))
+        importer.add_timetable(
+            (f"routes:{i}", "G1", i + 1, f"S{i}", time(8), time(8), i)
+            for i in range(stops)
+        )
+
+    importer = run_import(load, bind=engine)
+    engine.dispose()
+    assert importer.train_run_nums == 0
+    assert any(f"at most {MAX_ROUTE_STOPS}" in error for error in importer.errors)
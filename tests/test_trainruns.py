@@ -0,0 +1,33 @@
+import pytest
+from sql.crud import set_train_run_finished
+from sql.inventory import seat_inventory
+from conftest import create_train_run
+
+
+def availability(client, train_run_id: int, start_seq: int, end_seq: int):
+    return client.get(f"/train_runs/{train_run_id}/availability", params={"start_seq": start_seq, "end_seq": end_seq})
+
+def test_availability(client, train_run):
+    response = availability(client, train_run.train_run_id, 1, 4)
+    assert response.status_code == 200
+    assert sum(response.json()["seats"].values()) == train_run.seats
+
+@pytest.mark.parametrize("start_seq, end_seq", [(0, 2), (2, 2), (3, 2), (1, 5), (1, 30)])
+def test_availability_rejects_invalid_sequence(client, train_run, start_seq, end_seq):
+    response = availability(client, train_run.train_run_id, start_seq, end_seq)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid route sequence"
+
+def test_availability_requires_train_run_on_sale(client, session):
+    unlocked = create_train_run(session, locked=False)
+    finished = create_train_run(session)
+    set_train_run_finished(finished.train_run_id, True, session)
+    for train_run in (unlocked, finished):
+        response = availability(client, train_run.train_run_id, 1, 2)
+        assert response.status_code == 400
+        assert response.json()["detail"] == "TrainRun is not on sale"
+        # 不为未开售或已结束的车次加载库存
+        assert train_run.train_run_id not in seat_inventory._runs
+
+def test_availability_unknown_train_run(client):
+    assert availability(client, 10 ** 9, 1, 2).status_code == 404